@@ -3,7 +3,7 @@
 整合斐波那契計算器、股票訊號儀表板和族群熱度分析功能
 """
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, request, jsonify
 import sys
 import os
 
@@ -11,8 +11,8 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # 導入模組
-from routes.fibonacci_routes import fibonacci_bp
-from routes.stock_signals_routes import signals_bp
+from routes.fibonacci_routes import fibonacci_bp, fibonacci_calculator
+from routes.stock_signals_routes import signals_bp, stock_signals
 from routes.theme_analysis_routes import theme_analysis_bp
 
 app = Flask(__name__)
@@ -28,6 +28,9 @@ template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templa
 with open(template_path, 'r', encoding='utf-8') as f:
     HTML_TEMPLATE = f.read()
 
+# 啟動時預先編譯模板，避免每次請求都查詢模板快取
+INDEX_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -49,7 +52,6 @@ def index():
     if request.method == 'POST' and request.form.get('form_type') == 'fibonacci':
         context['active_tab'] = 'fibonacci'
         try:
-            from routes.fibonacci_routes import fibonacci_calculator
             fibo_result = fibonacci_calculator()
             context.update({
                 'fibonacci_error': fibo_result.get('fibonacci_error'),
@@ -66,7 +68,6 @@ def index():
     if request.method == 'POST' and request.form.get('form_type') == 'signal':
         context['active_tab'] = 'signals'
         try:
-            from routes.stock_signals_routes import stock_signals
             signals_result = stock_signals()
             context.update({
                 'signal_error': signals_result.get('signal_error'),
@@ -75,7 +76,7 @@ def index():
         except Exception as e:
             context['signal_error'] = f'查詢錯誤: {str(e)}'
     
-    return render_template_string(HTML_TEMPLATE, **context)
+    return INDEX_TEMPLATE.render(**context)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,15 @@
+"""
+Gunicorn 設定檔（gunicorn 啟動時會自動讀取目前目錄下的 gunicorn.conf.py）
+"""
+
+# preload_app 會在 master 載入 app（含 requests / ssl），
+# 必須在任何模組導入前完成 gevent monkey patch
+from gevent import monkey
+monkey.patch_all()
+
+# gevent worker：等待 TWSE / TPEx / MoneyDJ 回應時可同時處理其他請求
+worker_class = "gevent"
+worker_connections = 100
+
+# 在 master 載入一次 app（讀取並編譯 index.html 模板），fork 後各 worker 以 copy-on-write 共用
+preload_app = True
@@ -0,0 +1,69 @@
+"""
+行程內結果快取工具
+提供有效期限與筆數上限的快取裝飾器，供爬蟲模組與路由共用。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import pandas as pd
+
+
+# 預設有效秒數（排行、歷史價格約 5 分鐘內不會變動）
+DEFAULT_TTL = 300
+# 預設每個被快取函式最多保留的結果筆數（鍵常來自使用者輸入，例如 top_n、股票代碼，必須設上限）
+DEFAULT_MAXSIZE = 256
+
+
+def ttl_cache(seconds: int = DEFAULT_TTL, maxsize: int = DEFAULT_MAXSIZE):
+    """
+    以 (參數) 為鍵、在行程內快取函式結果的裝飾器，超過 seconds 秒後重新計算。
+
+    - 例外不會被快取；空的 DataFrame（例如查無資料的股票代碼）也不快取，
+      避免無效的查詢佔用快取空間
+    - DataFrame 結果於回傳時複製一份，避免呼叫端修改到快取內容
+    - 快取依寫入時間排序：寫入新結果時先移除所有已過期的項目，
+      仍達 maxsize 筆時再移除最早寫入的項目，因此不會隨不同參數無限成長
+
+    Args:
+        seconds: 快取有效秒數
+        maxsize: 最多保留的結果筆數
+
+    Returns:
+        裝飾器；被裝飾的函式另有 cache_clear() 可清除快取
+    """
+    def decorator(func):
+        # {key: (寫入時間, 結果)}，依寫入時間由舊到新排列
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(key)
+            if entry is None or now - entry[0] >= seconds:
+                result = func(*args, **kwargs)
+                if not (isinstance(result, pd.DataFrame) and result.empty):
+                    with lock:
+                        # 重新寫入的鍵移到最後，維持依寫入時間排序
+                        cache.pop(key, None)
+                        while cache and now - next(iter(cache.values()))[0] >= seconds:
+                            cache.popitem(last=False)
+                        while len(cache) >= maxsize:
+                            cache.popitem(last=False)
+                        cache[key] = (now, result)
+            else:
+                result = entry[1]
+            return result.copy() if isinstance(result, pd.DataFrame) else result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
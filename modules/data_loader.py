@@ -5,9 +5,11 @@
 
 import json
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -15,6 +17,82 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import scraper
 
+# 嘗試導入 orjson（解析速度較快），未安裝時退回標準庫 json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 嘗試導入 pyarrow（多執行緒 CSV 讀取），未安裝時退回 pandas.read_csv
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# 貼上資料解析用的正則表達式（模組載入時編譯一次）
+_WS_SPLIT_RE = re.compile(r"\s{2,}")  # 多個空格分隔
+_CODE_RE = re.compile(r"\b(\d{4})\b")  # 4 位數字股票代碼
+_CHINESE_RE = re.compile(r"[\u4e00-\u9fff]{2,}")  # 至少 2 個中文字的股票名稱
+_CHINESE_CHAR_RE = re.compile(r"[\u4e00-\u9fff]")  # 含任一中文字
+
+# 數值欄位清理用的字元刪除表（str.translate 單次掃描即可移除多個字元）
+_ARROW_STRIP = str.maketrans("", "", "▲▼")  # 漲跌符號
+_PCT_STRIP = str.maketrans("", "", "%,")  # 週轉率
+_CHG_PCT_STRIP = str.maketrans("", "", "%+,")  # 漲跌幅
+_PRICE_STRIP = str.maketrans("", "", ",$")  # 價格
+
+# 注意股解析用：「4位數字 + 至少一個中文字」，例如：1326台化、1815富喬、2375凱美
+_FOCUS_STOCK_RE = re.compile(r"^(\d{4})([\u4e00-\u9fff].*?)$")
+
+# 族群定義檔的預設候選路徑（依優先順序）
+# __file__ 是 final/modules/data_loader.py，parent.parent 是 final 資料夾
+_BASE_PATH = Path(__file__).parent.parent
+_DEFAULT_THEME_PATHS = (
+    _BASE_PATH / "themes_new.json",
+    _BASE_PATH.parent / "小工具" / "themes_new.json",
+    _BASE_PATH / "all_themes_supply_chain.json",
+    _BASE_PATH / "data" / "themes_supply_chain.json",
+)
+
+# JSON 檔案快取：{檔案路徑: (st_mtime_ns, 解析結果)}，檔案修改後自動失效
+_JSON_CACHE: Dict[str, Tuple[int, object]] = {}
+
+
+def _load_json_cached(json_path: Path):
+    """
+    讀取 JSON 檔案，並以檔案修改時間（mtime）作為快取失效依據。
+
+    族群定義檔在兩次編輯之間不會變動，因此同一路徑只在檔案被修改後才重新解析，
+    其餘請求只需一次 stat() 系統呼叫。
+
+    注意：回傳的物件在多個請求之間共用，呼叫端不應修改其內容。
+
+    Args:
+        json_path: JSON 檔案路徑
+
+    Returns:
+        解析後的 JSON 資料
+    """
+    key = str(json_path)
+    mtime_ns = os.stat(key).st_mtime_ns
+
+    cached = _JSON_CACHE.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    if ORJSON_AVAILABLE:
+        # orjson 直接解析 bytes，省去 utf-8 文字解碼步驟
+        data = orjson.loads(Path(json_path).read_bytes())
+    else:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    _JSON_CACHE[key] = (mtime_ns, data)
+    return data
+
 
 def load_supply_chain_json(json_path: Optional[str] = None, use_session_state: bool = True) -> Dict:
     """
@@ -38,38 +116,19 @@ def load_supply_chain_json(json_path: Optional[str] = None, use_session_state: b
     # 系統只使用 themes_new.json（唯讀）
     
     if json_path is None:
-        # 使用相對路徑，從 final 資料夾出發
-        # __file__ 是 final/modules/data_loader.py
-        # parent.parent 是 final 資料夾
-        base_path = Path(__file__).parent.parent
-        
-        # 優先讀取 themes_new.json（在 final 資料夾中）
-        themes_new_path = base_path / "themes_new.json"
-        if themes_new_path.exists():
-            json_path = themes_new_path
-        else:
-            # 其次嘗試從小工具資料夾找
-            parent_path = base_path.parent
-            themes_new_path = parent_path / "小工具" / "themes_new.json"
-            if themes_new_path.exists():
-                json_path = themes_new_path
-            else:
-                # 最後嘗試其他可能的路徑
-                all_themes_path = base_path / "all_themes_supply_chain.json"
-            if all_themes_path.exists():
-                json_path = all_themes_path
-            else:
-                json_path = base_path / "data" / "themes_supply_chain.json"
+        # 依優先順序取第一個存在的檔案；都不存在時使用最後一個候選路徑（下方會回報找不到）
+        json_path = _DEFAULT_THEME_PATHS[-1]
+        for candidate in _DEFAULT_THEME_PATHS:
+            if candidate.exists():
+                json_path = candidate
+                break
 
     json_path = Path(json_path)
-    if not json_path.exists():
+    try:
+        return _load_json_cached(json_path)
+    except FileNotFoundError:
         raise FileNotFoundError(f"找不到族群定義檔: {json_path}")
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    return data
-
 
 def load_full_supply_chain(path: Optional[str] = None) -> List[Dict]:
     """
@@ -116,8 +175,7 @@ def load_full_supply_chain(path: Optional[str] = None) -> List[Dict]:
         if not json_path.exists():
             return []
     
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = _load_json_cached(json_path)
     
     # 確保回傳的是 list
     if isinstance(data, list):
@@ -150,7 +208,15 @@ def load_today_topN_from_csv(csv_path: str, top_n: int = 50) -> pd.DataFrame:
     if not csv_path.exists():
         raise FileNotFoundError(f"找不到 CSV 檔案: {csv_path}")
 
-    df = pd.read_csv(csv_path, encoding="utf-8")
+    if PYARROW_AVAILABLE:
+        # code 欄位指定為字串，保留前導零（例如 0050）
+        table = pacsv.read_csv(
+            csv_path,
+            convert_options=pacsv.ConvertOptions(column_types={"code": pa.string()}),
+        )
+        df = table.to_pandas()
+    else:
+        df = pd.read_csv(csv_path, encoding="utf-8", dtype={"code": str})
 
     # 確保必要欄位存在
     required_cols = ["code", "name", "turnover"]
@@ -168,14 +234,14 @@ def load_today_topN_from_csv(csv_path: str, top_n: int = 50) -> pd.DataFrame:
     }
     df = df.rename(columns=col_mapping)
 
-    # 確保 code 是字串，補零到 4 位
-    df["code"] = df["code"].astype(str).str.zfill(4)
+    # 確保 code 補零到 4 位（讀檔時已指定為字串，不需再 astype(str)）
+    df["code"] = df["code"].str.zfill(4)
 
     # 確保 turnover 是數值
     df["turnover"] = pd.to_numeric(df["turnover"], errors="coerce")
 
-    # 按週轉率排序，取 Top N
-    df = df.sort_values("turnover", ascending=False).head(top_n).reset_index(drop=True)
+    # 按週轉率取 Top N（nlargest 只做部分排序，不需排序整個檔案）
+    df = df.nlargest(top_n, "turnover").reset_index(drop=True)
 
     # 確保有 close 和 chg_pct 欄位（若不存在則設為 NaN）
     if "close" not in df.columns:
@@ -221,6 +287,94 @@ def load_today_topN(top_n: Optional[int] = None, source: str = "paste", pasted_t
         return _generate_mock_data(top_n if top_n else 50)
 
 
+def _extract_fields(parts: List[str]) -> Tuple[str, str, str, str, str]:
+    """
+    從單行資料切割後的欄位中辨識各欄位文字。
+
+    Args:
+        parts: 已切割並去除空白的欄位清單
+
+    Returns:
+        (code_text, name_text, turnover_text, close_text, chg_pct_text)，找不到的欄位為空字串
+    """
+    # 根據欄位位置直接提取（Tab 分隔的格式較固定）
+    # 格式：排名	代碼	股票	成交價	漲跌	漲跌%	周漲跌%	振幅%	最高	最低	成交量	成交值 (億)	周轉率%
+    
+    # 尋找各欄位
+    code_text = ""
+    name_text = ""
+    turnover_text = ""
+    close_text = ""
+    chg_pct_text = ""
+    
+    # 方法1：如果欄位數量足夠，嘗試按位置提取
+    if len(parts) >= 13:
+        # 標準格式：排名(0)	代碼(1)	股票(2)	成交價(3)	漲跌(4)	漲跌%(5)	周漲跌%(6)	振幅%(7)	最高(8)	最低(9)	成交量(10)	成交值(11)	周轉率%(12)
+        if len(parts[1]) == 4 and parts[1].isdigit():
+            code_text = parts[1]
+        if parts[2] and _CHINESE_CHAR_RE.search(parts[2]):
+            name_text = parts[2]
+        if parts[3]:
+            close_text = parts[3].replace(",", "")
+        if parts[5]:
+            chg_pct_text = parts[5].translate(_CHG_PCT_STRIP)
+        if parts[12]:
+            turnover_text = parts[12].translate(_PCT_STRIP)
+    
+    # 方法2：如果方法1失敗，使用原本的智能識別
+    if not code_text or not turnover_text:
+        for idx, part in enumerate(parts):
+            # 尋找 4 位數字（股票代碼）
+            if not code_text:
+                code_match = _CODE_RE.search(part)
+                if code_match:
+                    code_text = code_match.group(1)
+                    continue
+            
+            # 尋找週轉率（包含 %，且不是漲跌幅）
+            if "%" in part and not turnover_text:
+                # 排除漲跌幅（通常有 + 或 -，或在特定位置）
+                if "+" not in part and "-" not in part and "周轉率" not in part and "週轉率" not in part:
+                    # 週轉率通常在最後幾欄
+                    if idx >= len(parts) - 3:
+                        turnover_text = part.translate(_PCT_STRIP).strip()
+                        continue
+            
+            # 尋找漲跌幅（包含 % 和 + 或 -）
+            if ("+" in part or "-" in part) and "%" in part and not chg_pct_text:
+                # 漲跌幅通常在前面幾欄（第5或第6欄）
+                if 4 <= idx <= 6:
+                    chg_pct_text = part.translate(_CHG_PCT_STRIP).strip()
+                    continue
+            
+            # 尋找價格（數字，有小數點，通常在合理範圍內）
+            if "." in part and not close_text:
+                try:
+                    price_text = part.translate(_PRICE_STRIP)
+                    price = float(price_text)
+                    if 1 <= price <= 10000:  # 合理的股價範圍
+                        # 成交價通常在代碼後面（第3或第4欄）
+                        if 2 <= idx <= 4:
+                            close_text = price_text
+                            continue
+                except:
+                    pass
+            
+            # 尋找中文股票名稱（至少 2 個中文字）
+            if not name_text:
+                chinese_match = _CHINESE_RE.search(part)
+                if chinese_match:
+                    name_text = chinese_match.group(0)
+                    continue
+    
+    # 如果沒有找到代碼，嘗試從第二欄提取（通常是代碼位置）
+    if not code_text and len(parts) >= 2:
+        if parts[1].isdigit() and len(parts[1]) == 4:
+            code_text = parts[1]
+    
+    return code_text, name_text, turnover_text, close_text, chg_pct_text
+
+
 def _parse_pasted_data(pasted_text: str, top_n: Optional[int] = None) -> pd.DataFrame:
     """
     解析貼上的表格資料。
@@ -241,7 +395,12 @@ def _parse_pasted_data(pasted_text: str, top_n: Optional[int] = None) -> pd.Data
     if not lines:
         raise Exception("貼上的資料為空")
     
-    data = []
+    # 以平行欄位清單收集資料，避免每列建立一個 dict
+    codes: List[str] = []
+    names: List[str] = []
+    turnovers: List[float] = []
+    closes: List[Optional[float]] = []
+    chg_pcts: List[Optional[float]] = []
     
     # 尋找表頭行（包含「代碼」、「股票」、「週轉率」等關鍵字）
     header_line_idx = -1
@@ -260,92 +419,25 @@ def _parse_pasted_data(pasted_text: str, top_n: Optional[int] = None) -> pd.Data
             continue
         
         # 移除特殊符號（▲ ▼）
-        line_cleaned = line.replace('▲', '').replace('▼', '').strip()
+        line_cleaned = line.translate(_ARROW_STRIP).strip()
+        
+        # 先過濾：整行沒有獨立的 4 位數字就不可能有股票代碼（表頭、分隔線、說明文字等），
+        # 直接跳過，不進行切割與欄位辨識
+        if not _CODE_RE.search(line_cleaned):
+            continue
         
         # 嘗試用 tab 分隔（優先）
         if '\t' in line:
             parts = [p.strip() for p in line_cleaned.split('\t')]
         else:
             # 用多個空格分隔
-            parts = [p.strip() for p in re.split(r'\s{2,}', line_cleaned)]
+            parts = [p.strip() for p in _WS_SPLIT_RE.split(line_cleaned)]
         
         if len(parts) < 3:
             continue
         
         try:
-            # 根據欄位位置直接提取（Tab 分隔的格式較固定）
-            # 格式：排名	代碼	股票	成交價	漲跌	漲跌%	周漲跌%	振幅%	最高	最低	成交量	成交值 (億)	周轉率%
-            
-            # 尋找各欄位
-            code_text = ""
-            name_text = ""
-            turnover_text = ""
-            close_text = ""
-            chg_pct_text = ""
-            
-            # 方法1：如果欄位數量足夠，嘗試按位置提取
-            if len(parts) >= 13:
-                # 標準格式：排名(0)	代碼(1)	股票(2)	成交價(3)	漲跌(4)	漲跌%(5)	周漲跌%(6)	振幅%(7)	最高(8)	最低(9)	成交量(10)	成交值(11)	周轉率%(12)
-                if len(parts[1]) == 4 and parts[1].isdigit():
-                    code_text = parts[1]
-                if parts[2] and any(c >= '\u4e00' and c <= '\u9fff' for c in parts[2]):
-                    name_text = parts[2]
-                if parts[3]:
-                    close_text = parts[3].replace(",", "")
-                if parts[5]:
-                    chg_pct_text = parts[5].replace("%", "").replace("+", "").replace(",", "")
-                if parts[12]:
-                    turnover_text = parts[12].replace("%", "").replace(",", "")
-            
-            # 方法2：如果方法1失敗，使用原本的智能識別
-            if not code_text or not turnover_text:
-                for idx, part in enumerate(parts):
-                    # 尋找 4 位數字（股票代碼）
-                    if not code_text:
-                        code_match = re.search(r'\b(\d{4})\b', part)
-                        if code_match:
-                            code_text = code_match.group(1)
-                            continue
-                    
-                    # 尋找週轉率（包含 %，且不是漲跌幅）
-                    if "%" in part and not turnover_text:
-                        # 排除漲跌幅（通常有 + 或 -，或在特定位置）
-                        if "+" not in part and "-" not in part and "周轉率" not in part and "週轉率" not in part:
-                            # 週轉率通常在最後幾欄
-                            if idx >= len(parts) - 3:
-                                turnover_text = part.replace("%", "").replace(",", "").strip()
-                                continue
-                    
-                    # 尋找漲跌幅（包含 % 和 + 或 -）
-                    if ("+" in part or "-" in part) and "%" in part and not chg_pct_text:
-                        # 漲跌幅通常在前面幾欄（第5或第6欄）
-                        if 4 <= idx <= 6:
-                            chg_pct_text = part.replace("%", "").replace("+", "").replace(",", "").strip()
-                            continue
-                    
-                    # 尋找價格（數字，有小數點，通常在合理範圍內）
-                    if "." in part and not close_text:
-                        try:
-                            price = float(part.replace(",", "").replace("$", ""))
-                            if 1 <= price <= 10000:  # 合理的股價範圍
-                                # 成交價通常在代碼後面（第3或第4欄）
-                                if 2 <= idx <= 4:
-                                    close_text = part.replace(",", "").replace("$", "")
-                                    continue
-                        except:
-                            pass
-                    
-                    # 尋找中文股票名稱（至少 2 個中文字）
-                    if not name_text:
-                        chinese_match = re.search(r'[\u4e00-\u9fff]{2,}', part)
-                        if chinese_match:
-                            name_text = chinese_match.group(0)
-                            continue
-            
-            # 如果沒有找到代碼，嘗試從第二欄提取（通常是代碼位置）
-            if not code_text and len(parts) >= 2:
-                if parts[1].isdigit() and len(parts[1]) == 4:
-                    code_text = parts[1]
+            code_text, name_text, turnover_text, close_text, chg_pct_text = _extract_fields(parts)
             
             # 驗證代碼
             if not code_text or not code_text.isdigit() or len(code_text) != 4:
@@ -361,33 +453,35 @@ def _parse_pasted_data(pasted_text: str, top_n: Optional[int] = None) -> pd.Data
             
             # 只保留有週轉率的資料
             if turnover > 0:
-                data.append({
-                    "code": code_text.zfill(4),
-                    "name": name_text if name_text else "",
-                    "turnover": turnover,
-                    "close": close,
-                    "chg_pct": chg_pct,
-                })
+                codes.append(code_text)
+                names.append(name_text)
+                turnovers.append(turnover)
+                closes.append(close)
+                chg_pcts.append(chg_pct)
         except Exception as e:
             # 跳過無法解析的行
             continue
     
-    if not data:
+    if not codes:
         raise Exception("無法從貼上的資料中提取股票資訊。請確認資料格式是否正確。")
     
-    # 轉換為 DataFrame
-    df = pd.DataFrame(data)
-    df["code"] = df["code"].astype(str).str.zfill(4)
-    df["turnover"] = pd.to_numeric(df["turnover"], errors="coerce")
-    df["close"] = pd.to_numeric(df["close"], errors="coerce")
-    df["chg_pct"] = pd.to_numeric(df["chg_pct"], errors="coerce")
+    # 轉換為 DataFrame（數值欄位一次向量化轉換）
+    df = pd.DataFrame({
+        "code": codes,
+        "name": names,
+        "turnover": turnovers,
+        "close": closes,
+        "chg_pct": chg_pcts,
+    })
+    # code 在解析時已驗證為 4 位數字，不需再補零
+    numeric_cols = ["turnover", "close", "chg_pct"]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
     
-    # 按週轉率排序
-    df = df.sort_values("turnover", ascending=False).reset_index(drop=True)
-    
-    # 如果指定了 top_n，才限制數量
+    # 如果指定了 top_n，只取前 N 名（部分排序）；否則按週轉率完整排序
     if top_n is not None and top_n > 0:
-        df = df.head(top_n)
+        df = df.nlargest(top_n, "turnover").reset_index(drop=True)
+    else:
+        df = df.sort_values("turnover", ascending=False).reset_index(drop=True)
     
     return df[["code", "name", "turnover", "close", "chg_pct"]]
 
@@ -414,13 +508,27 @@ def parse_focus_stock_list(raw_text: str) -> pd.DataFrame:
     if not raw_text or not raw_text.strip():
         return pd.DataFrame(columns=["code", "name"])
 
-    lines = raw_text.strip().split("\n")
-    stocks = []
+    stocks = _parse_focus_stock_rows(raw_text)
+    if not stocks:
+        return pd.DataFrame(columns=["code", "name"])
+
+    # 每次回傳新的 DataFrame，呼叫端可自由修改而不影響快取
+    return pd.DataFrame(list(stocks), columns=["code", "name"])
+
 
-    # 正則表達式：匹配「4位數字 + 至少一個中文字」的格式
-    # 例如：1326台化、1815富喬、2375凱美
-    # 使用非貪婪匹配，只取到第一個中文字後的所有內容（可能包含其他字元）
-    pattern = re.compile(r"^(\d{4})([\u4e00-\u9fff].*?)$")
+@lru_cache(maxsize=32)
+def _parse_focus_stock_rows(raw_text: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    parse_focus_stock_list() 的純文字解析部分，結果以不可變 tuple 快取。
+
+    使用者切換頁籤時常重複送出同一段注意股文字，相同文字直接回傳快取結果，
+    不需重新跑正則比對。
+
+    Returns:
+        (code, name) tuple 的序列，已依 code 去重（保留第一次出現）
+    """
+    lines = raw_text.strip().split("\n")
+    stocks: Dict[str, str] = {}
 
     for line in lines:
         line = line.strip()
@@ -432,24 +540,16 @@ def parse_focus_stock_list(raw_text: str) -> pd.DataFrame:
             continue
 
         # 嘗試匹配「4位數字 + 中文名稱」的格式
-        match = pattern.match(line)
+        match = _FOCUS_STOCK_RE.match(line)
         if match:
             code = match.group(1)  # 前4碼數字
             name = match.group(2).strip()  # 後面的中文名稱
 
-            # 確保 code 是 4 位數字字串
-            if code.isdigit() and len(code) == 4:
-                stocks.append({"code": code, "name": name})
-
-    if not stocks:
-        return pd.DataFrame(columns=["code", "name"])
+            # 確保 code 是 4 位數字字串；去重（同一檔股票可能出現多次，保留第一筆）
+            if code.isdigit() and len(code) == 4 and code not in stocks:
+                stocks[code] = name
 
-    df = pd.DataFrame(stocks)
-
-    # 去重（同一檔股票可能出現多次）
-    df = df.drop_duplicates(subset=["code"], keep="first").reset_index(drop=True)
-
-    return df
+    return tuple(stocks.items())
 
 
 def load_attention_stocks_from_web() -> pd.DataFrame:
@@ -472,8 +572,6 @@ def _generate_mock_data(top_n: int = 50) -> pd.DataFrame:
     Returns:
         DataFrame
     """
-    import random
-
     # 一些真實的台股代碼與名稱（涵蓋不同族群）
     mock_stocks = [
         ("2313", "華通", 15.5, 85.2, 2.3),
@@ -498,26 +596,25 @@ def _generate_mock_data(top_n: int = 50) -> pd.DataFrame:
         ("3035", "智原", 6.8, 420.0, 2.2),
     ]
 
-    # 如果 top_n 超過 mock_stocks 數量，重複使用並加入隨機變動
-    data = []
-    for i in range(top_n):
-        stock = mock_stocks[i % len(mock_stocks)]
-        code, name, base_turnover, base_close, base_chg = stock
-
-        # 加入一些隨機變動，讓資料更真實
-        turnover = base_turnover * (0.8 + random.random() * 0.4)
-        close = base_close * (0.95 + random.random() * 0.1)
-        chg_pct = base_chg + (random.random() - 0.5) * 2
-
-        data.append({
-            "code": code,
-            "name": name,
-            "turnover": round(turnover, 2),
-            "close": round(close, 2),
-            "chg_pct": round(chg_pct, 2),
-        })
-
-    df = pd.DataFrame(data)
+    # 如果 top_n 超過 mock_stocks 數量，重複使用並加入隨機變動（整欄一次計算）
+    idx = np.arange(top_n) % len(mock_stocks)
+    codes = np.array([stock[0] for stock in mock_stocks])[idx]
+    names = np.array([stock[1] for stock in mock_stocks])[idx]
+    base = np.array([stock[2:] for stock in mock_stocks], dtype=float)[idx]
+
+    # 加入一些隨機變動，讓資料更真實
+    rng = np.random.default_rng()
+    turnover = base[:, 0] * (0.8 + rng.random(top_n) * 0.4)
+    close = base[:, 1] * (0.95 + rng.random(top_n) * 0.1)
+    chg_pct = base[:, 2] + (rng.random(top_n) - 0.5) * 2
+
+    df = pd.DataFrame({
+        "code": codes,
+        "name": names,
+        "turnover": np.round(turnover, 2),
+        "close": np.round(close, 2),
+        "chg_pct": np.round(chg_pct, 2),
+    })
 
     # 按週轉率排序
     df = df.sort_values("turnover", ascending=False).reset_index(drop=True)
@@ -11,7 +11,52 @@ import sys
 import os
 # 添加當前目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from theme_engine import get_stocks_in_theme, get_all_members_of_theme, get_today_members_of_theme
+from theme_engine import get_all_members_of_theme, get_today_members_of_theme, normalize_themes_data, find_sector_by_name
+
+
+def _group_stock_records_by_theme(
+    stocks_df: pd.DataFrame,
+    stock_to_themes: Dict[str, List[str]],
+) -> Dict[str, List[Dict]]:
+    """
+    一次將 Top N 股票依族群分組，取代逐一族群呼叫 get_stocks_in_theme()。
+
+    先展開成「股票代碼 - 族群」的長格式對應表，與 stocks_df 合併後依族群分組，
+    每個族群的股票排序方式與 get_stocks_in_theme() 相同
+    （有 turnover 欄位時按週轉率降序，否則按代碼升序）。
+
+    Args:
+        stocks_df: 股票 DataFrame
+        stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
+
+    Returns:
+        字典，key 為族群名稱，value 為該族群股票的 records 列表
+    """
+    pairs = [
+        (stock_code, theme_name)
+        for stock_code, themes in stock_to_themes.items()
+        for theme_name in themes
+    ]
+    if not pairs or stocks_df.empty:
+        return {}
+
+    pairs_df = pd.DataFrame(pairs, columns=["_code_key", "_theme_name"])
+    keyed_df = stocks_df.assign(_code_key=stocks_df["code"].astype(str).str.zfill(4))
+    merged = keyed_df.merge(pairs_df, on="_code_key", how="inner")
+
+    if "turnover" in merged.columns:
+        merged = merged.sort_values("turnover", ascending=False)
+    else:
+        merged = merged.sort_values("code", ascending=True)
+
+    # 整張表只轉換一次 records，再依族群分桶（避免每個族群各自 to_dict）
+    theme_names = merged["_theme_name"].tolist()
+    records = merged.drop(columns=["_code_key", "_theme_name"]).to_dict("records")
+
+    records_by_theme: Dict[str, List[Dict]] = {}
+    for theme_name, record in zip(theme_names, records):
+        records_by_theme.setdefault(theme_name, []).append(record)
+    return records_by_theme
 
 
 def build_theme_report(
@@ -38,44 +83,11 @@ def build_theme_report(
     # 建立族群詳細資訊
     theme_details = {}
 
-    # 判斷是新格式還是舊格式
-    # 支援四種格式：
-    # 1. themes_new.json 格式（物件，有 themes 鍵）
-    # 2. 新格式（物件，有 popular_sectors 鍵）
-    # 3. 直接陣列格式（陣列，每個元素是族群物件）
-    # 4. 舊格式（物件，有 族群清單 鍵）
-    
-    sectors_list = None
-    if isinstance(themes_data, list):
-        # 直接陣列格式
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        # 新格式（物件，有 popular_sectors 鍵）
-        sectors_list = themes_data.get("popular_sectors", [])
+    # 一次取得所有族群在 Top N 中實際出現的股票
+    stocks_by_theme = _group_stock_records_by_theme(stocks_df, stock_to_themes)
+
+    # 統一轉換為 sector 清單（舊格式回傳 None）
+    sectors_list = normalize_themes_data(themes_data)
     
     if sectors_list is not None:
         # 新格式或直接陣列格式
@@ -83,9 +95,6 @@ def build_theme_report(
             sector_name = sector_info.get("sector_name", "")
             description = sector_info.get("description", "")
 
-            # 取得該族群在 Top N 中實際出現的股票
-            theme_stocks = get_stocks_in_theme(stocks_df, stock_to_themes, sector_name)
-
             # 整理供應鏈結構
             supply_chain = {}
             
@@ -136,23 +145,20 @@ def build_theme_report(
             theme_details[sector_name] = {
                 "description": description,
                 "supply_chain": supply_chain,
-                "stocks_in_topN": theme_stocks.to_dict("records") if not theme_stocks.empty else [],
+                "stocks_in_topN": stocks_by_theme.get(sector_name, []),
             }
     else:
         # 舊格式
         for theme_info in themes_data.get("族群清單", []):
             theme_name = theme_info.get("族群名稱", "")
 
-            # 取得該族群在 Top N 中實際出現的股票
-            theme_stocks = get_stocks_in_theme(stocks_df, stock_to_themes, theme_name)
-
             theme_details[theme_name] = {
                 "supply_chain": {
                     "上游": theme_info.get("上游", {}),
                     "中游": theme_info.get("中游", {}),
                     "下游": theme_info.get("下游", {}),
                 },
-                "stocks_in_topN": theme_stocks.to_dict("records") if not theme_stocks.empty else [],
+                "stocks_in_topN": stocks_by_theme.get(theme_name, []),
             }
 
     return {
@@ -189,49 +195,13 @@ def get_theme_detail_for_display(
     Returns:
         族群詳細資訊字典，若不存在則返回 None
     """
-    # 判斷格式
-    sectors_list = None
-    if isinstance(themes_data, list):
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        sectors_list = themes_data.get("popular_sectors", [])
-    else:
+    sectors_list = normalize_themes_data(themes_data)
+    if sectors_list is None:
         # 舊格式，不支援
         return None
     
-    # 尋找對應的族群
-    selected_sector = None
-    for sector_info in sectors_list:
-        if not isinstance(sector_info, dict):
-            continue
-        sector_name = sector_info.get("sector_name", "")
-        if sector_name == theme_name:
-            selected_sector = sector_info
-            break
+    # 尋找對應的族群（快取的名稱索引，直接查詢）
+    selected_sector = find_sector_by_name(themes_data, theme_name)
     
     if not selected_sector:
         return None
@@ -1,27 +1,166 @@
 import requests
+import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
+import html
+import logging
 import re
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from pathlib import Path
 from typing import Optional
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
+import sys
+import os
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from cache_utils import ttl_cache
+
+# 嘗試導入 orjson（解析速度較快），未安裝時退回 response.json()
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 嘗試導入 requests-cache（HTTP 回應快取），未安裝時使用一般 Session
+try:
+    import requests_cache
+    REQUESTS_CACHE_AVAILABLE = True
+except ImportError:
+    REQUESTS_CACHE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# MoneyDJ 連結函式 GenLink2stk('AQ087470','名稱') 與 HTML 標籤的預編譯正規式
+_GENLINK_RE = re.compile(r"GenLink2stk\('([A-Z]{1,2})(\d+)','([^']+)'\)")
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+# MoneyDJ 注意股主表格，以及表格中「script 連結 td + 事項描述 td」的一列
+_MAIN_TABLE_RE = re.compile(r'<table[^>]*\bid=["\']?oMainTable\b[^>]*>(.*?)</table>', re.DOTALL | re.IGNORECASE)
+_ATTENTION_ROW_RE = re.compile(
+    r"<script[^>]*>\s*GenLink2stk\('([A-Z]{1,2})(\d+)','([^']+)'\);?\s*</script>\s*</td>\s*<td[^>]*>(.*?)</td>",
+    re.DOTALL | re.IGNORECASE,
+)
+# 數值欄位中需移除的符號（str.translate 刪除表，單次 C 層掃描）
+_RANK_STRIP = str.maketrans('', '', '%,+▲▼')  # 週轉率排行表格
+_COMMA_STRIP = str.maketrans('', '', ',')  # API 千分位
+# 移除 '--' 後代表「無資料」的字串
+_EMPTY_TOKENS = frozenset({'', '-'})
+
+# HTTP 快取檔位置與有效時間（資料一個交易日才更新，15 分鐘內重複呼叫直接讀快取）
+_HTTP_CACHE_PATH = Path(__file__).resolve().parent.parent / "scraper_cache"
+_HTTP_CACHE_EXPIRE = timedelta(minutes=15)
+
+# 共用的 HTTP Session 於第一次抓取時才建立（見 _get_session）：
+# gunicorn preload_app 會在 master 載入本模組，匯入時不應建立快取檔或連線
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+# 判斷 HTML 頁面是否為預期內容（週轉率排行表格、MoneyDJ 注意股連結）
+_HTML_PAYLOAD_RE = re.compile(r'週轉率|周轉率|GenLink2stk')
+
+
+def _is_valid_payload(response) -> bool:
+    """
+    requests-cache 的 filter_fn：只快取內容有效的回應。
+
+    TWSE / TPEx 在維護或限流時仍可能回傳 200 加上空白或錯誤內容，
+    這類回應不寫入快取，下一次呼叫會重新抓取，而不是沿用 15 分鐘的錯誤結果。
+
+    Args:
+        response: requests 回應
+
+    Returns:
+        JSON 有資料列、或 HTML 含預期表格標記時為 True
+    """
+    content = response.content
+    if not content or not content.strip():
+        return False
+
+    if content.lstrip()[:1] in (b"[", b"{"):
+        try:
+            data = orjson.loads(content) if ORJSON_AVAILABLE else response.json()
+        except ValueError:
+            return False
+        if isinstance(data, list):
+            # TWSE OpenAPI：非空的資料陣列
+            return bool(data)
+        if isinstance(data, dict):
+            # TPEx：tables[0]['data'] 或 aaData 需有資料列
+            tables = data.get("tables")
+            if isinstance(tables, list) and tables and isinstance(tables[0], dict):
+                return bool(tables[0].get("data"))
+            return bool(data.get("aaData"))
+        return False
+
+    return _HTML_PAYLOAD_RE.search(response.text) is not None
+
+
+def _get_session() -> requests.Session:
+    """
+    取得共用的 HTTP Session（第一次呼叫時建立）。
+
+    重用 TCP/TLS 連線（TWSE 兩支 API 位於同一主機），並啟用 gzip 壓縮；
+    若有安裝 requests-cache，改用 SQLite 快取的 Session，未過期且內容有效的 GET 回應不再重新下載。
+
+    Returns:
+        requests.Session（或 requests_cache.CachedSession）
+    """
+    global _SESSION
+    if _SESSION is not None:
+        return _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            if REQUESTS_CACHE_AVAILABLE:
+                session = requests_cache.CachedSession(
+                    str(_HTTP_CACHE_PATH),
+                    backend="sqlite",
+                    expire_after=_HTTP_CACHE_EXPIRE,
+                    allowable_methods=["GET"],
+                    allowable_codes=[200],
+                    cache_control=True,
+                    filter_fn=_is_valid_payload,
+                )
+            else:
+                session = requests.Session()
+            session.headers.update({
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+                "Accept-Encoding": "gzip, deflate",
+            })
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=20,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"]
+                )
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSION = session
+    return _SESSION
+
+
+@ttl_cache()
 def fetch_turnover_rank_data(top_n: Optional[int] = None) -> pd.DataFrame:
     """
     從玩股網抓取當日週轉率排行資料。
     URL: https://www.wantgoo.com/stock/ranking/turnover-rate
     """
     url = "https://www.wantgoo.com/stock/ranking/turnover-rate"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
     
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = _get_session().get(url, timeout=15)
         response.raise_for_status()
         
         from io import StringIO
-        # 使用 pandas 解析表格
-        dfs = pd.read_html(StringIO(response.text))
+        # 使用 pandas 解析表格：指定 lxml（C 實作）解析，並以 match 只保留含週轉率字樣的表格
+        dfs = pd.read_html(StringIO(response.text), flavor='lxml', match=r'週轉率|周轉率')
         
         target_df = None
         for df in dfs:
@@ -32,18 +171,11 @@ def fetch_turnover_rank_data(top_n: Optional[int] = None) -> pd.DataFrame:
             # 確保欄位名稱是字串
             df.columns = [str(c) for c in df.columns]
             
-            # 檢查欄位
-            cols = df.columns.tolist()
-            
-            # 使用最簡單的字串匹配
-            check_turnover = False
-            check_code = False
-            check_name = False
-            
-            for c in cols:
-                if '週轉率' in c or '周轉率' in c: check_turnover = True
-                if '代碼' in c: check_code = True
-                if '股票' in c or '名稱' in c: check_name = True
+            # 檢查欄位：將欄位名稱合併成單一字串後做子字串比對
+            joined = '|'.join(df.columns)
+            check_turnover = '週轉率' in joined or '周轉率' in joined
+            check_code = '代碼' in joined
+            check_name = '股票' in joined or '名稱' in joined
             
             if check_turnover and check_code and check_name:
                 target_df = df
@@ -75,41 +207,70 @@ def fetch_turnover_rank_data(top_n: Optional[int] = None) -> pd.DataFrame:
             
         # 資料清理
         # 1. 代碼轉為 4 位字串
-        df['code'] = df['code'].astype(str).str.zfill(4)
-        
-        # 2. 數值欄位清理 (移除 %, ,, +, ▲, ▼)
-        def clean_numeric(val):
-            if pd.isna(val): return val
-            s = str(val)
-            s = s.replace('%', '').replace(',', '').replace('+', '')
-            s = s.replace('▲', '').replace('▼', '')
-            try:
-                return float(s)
-            except:
-                return 0.0
-
-        df['turnover'] = df['turnover'].apply(clean_numeric)
+        # read_html 通常把代碼解析為整數，直接用 NumPy 字串 ufunc 補零
+        df['code'] = np.char.zfill(df['code'].to_numpy(dtype=str), 4)
+        
+        # 2. 數值欄位清理 (移除 %, ,, +, ▲, ▼)，整欄向量化處理
+        df['turnover'] = _clean_rank_series(df['turnover'])
         
         if 'close' in df.columns:
-            df['close'] = df['close'].apply(clean_numeric)
+            df['close'] = _clean_rank_series(df['close'])
         else:
             df['close'] = 0.0
             
         if 'chg_pct' in df.columns:
-            df['chg_pct'] = df['chg_pct'].apply(clean_numeric)
+            df['chg_pct'] = _clean_rank_series(df['chg_pct'])
         else:
             df['chg_pct'] = 0.0
             
-        # 排序與篩選
-        df = df.sort_values('turnover', ascending=False).reset_index(drop=True)
-        
-        if top_n:
-            df = df.head(top_n)
+        # 排序與篩選：指定 top_n 時只做部分排序取前 N 名，否則完整排序
+        if top_n is not None and top_n > 0:
+            df = df.nlargest(top_n, 'turnover').reset_index(drop=True)
+        else:
+            df = df.sort_values('turnover', ascending=False).reset_index(drop=True)
             
         return df[['code', 'name', 'turnover', 'close', 'chg_pct']]
 
     except Exception as e:
-        raise Exception(f"抓取週轉率資料失敗: {str(e)}")
+        raise Exception(f"抓取週轉率資料失敗: {str(e)}") from e
+
+
+def _cell_text(cell_html: str) -> str:
+    """
+    取出 td 內的純文字，效果等同 BeautifulSoup 的 get_text(strip=True)。
+    
+    Args:
+        cell_html: td 內部的 HTML
+    
+    Returns:
+        去除標籤、解碼實體並去除各段前後空白後串接的文字
+    """
+    fragments = (html.unescape(t).strip() for t in _HTML_TAG_RE.split(cell_html))
+    return ''.join(f for f in fragments if f)
+
+
+def _parse_attention_rows(page_html: str) -> list:
+    """
+    直接以正規式掃描 MoneyDJ 注意股主表格的原始 HTML，不建立 DOM。
+    
+    Args:
+        page_html: 頁面 HTML
+    
+    Returns:
+        [{'code', 'name', 'detail'}, ...]，找不到主表格或格式不符時為空 list
+    """
+    table_match = _MAIN_TABLE_RE.search(page_html)
+    if not table_match:
+        return []
+    
+    stocks = []
+    seen_codes = set()
+    for prefix, code, name, detail_html in _ATTENTION_ROW_RE.findall(table_match.group(1)):
+        if code in seen_codes:
+            continue
+        stocks.append({'code': code, 'name': name, 'detail': _cell_text(detail_html)})
+        seen_codes.add(code)
+    return stocks
 
 
 def fetch_attention_stock_data() -> pd.DataFrame:
@@ -121,18 +282,20 @@ def fetch_attention_stock_data() -> pd.DataFrame:
         DataFrame，包含 code, name, detail 欄位
     """
     url = "https://www.moneydj.com/Z/ZE/ZEV/ZEV.djhtm"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
     
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = _get_session().get(url, timeout=15)
         response.raise_for_status()
         
-        stocks = []
+        # 主要策略：以正規式一次掃描主表格原始 HTML，不建立 DOM
+        stocks = _parse_attention_rows(response.text)
+        if stocks:
+            return pd.DataFrame(stocks)
+        
+        # 版面變動導致正規式抓不到時，退回 BeautifulSoup 解析
         seen_codes = set()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
         
         # MoneyDJ 使用 JavaScript 動態生成連結
         # 結構：<td><script>GenLink2stk('AQ087470','道瓊銅永豐53購01');</script></td>
@@ -155,7 +318,7 @@ def fetch_attention_stock_data() -> pd.DataFrame:
                     continue
                 
                 # 解析 GenLink2stk('AQ087470','道瓊銅永豐53購01');
-                match = re.search(r"GenLink2stk\('([A-Z]{1,2})(\d+)','([^']+)'\)", script.string)
+                match = _GENLINK_RE.search(script.string)
                 if not match:
                     continue
                 
@@ -175,13 +338,10 @@ def fetch_attention_stock_data() -> pd.DataFrame:
         if stocks:
             return pd.DataFrame(stocks)
         
-        # 備用策略：從所有 script 標籤中提取
-        scripts = soup.find_all('script')
+        # 備用策略：從所有含 GenLink2stk 的 script 標籤中提取（由 bs4 直接篩選節點）
+        scripts = soup.find_all('script', string=_GENLINK_RE)
         for script in scripts:
-            if not script.string or 'GenLink2stk' not in script.string:
-                continue
-            
-            matches = re.findall(r"GenLink2stk\('([A-Z]{1,2})(\d+)','([^']+)'\)", script.string)
+            matches = _GENLINK_RE.findall(script.string)
             for match in matches:
                 prefix = match[0]
                 code = match[1]
@@ -209,7 +369,7 @@ def fetch_attention_stock_data() -> pd.DataFrame:
         return pd.DataFrame(stocks)
 
     except Exception as e:
-        raise Exception(f"抓取注意股資料失敗: {str(e)}")
+        raise Exception(f"抓取注意股資料失敗: {str(e)}") from e
 
 
 def clean_numeric(value):
@@ -225,16 +385,63 @@ def clean_numeric(value):
     if value is None or pd.isna(value):
         return None
     
-    # 轉為字串並移除逗號和特殊字符
-    s = str(value).replace(",", "").replace("--", "").strip()
+    # 轉為字串並移除逗號和特殊字符；無資料的字串直接回傳 NaN，不必進入轉換
+    s = str(value).translate(_COMMA_STRIP).replace("--", "").strip()
+    if s in _EMPTY_TOKENS:
+        return np.nan
     
-    # 嘗試轉為數值
-    try:
-        return pd.to_numeric(s, errors="coerce")
-    except:
-        return None
+    return pd.to_numeric(s, errors="coerce")
 
 
+def _clean_rank_series(series: pd.Series) -> pd.Series:
+    """
+    向量化清洗週轉率排行的數值欄位（移除 %, ,, +, ▲, ▼）。
+    
+    Args:
+        series: 原始欄位
+    
+    Returns:
+        float 欄位；原本為空值者維持 NaN，無法解析者為 0.0
+    """
+    cleaned = series.astype(str).str.translate(_RANK_STRIP).str.strip()
+    # 全為整數字串時 to_numeric 會得到 int64，統一轉為 float（與逐格 clean 的結果相同）
+    values = pd.to_numeric(cleaned, errors='coerce').astype(float).fillna(0.0)
+    return values.where(series.notna())
+
+
+def clean_numeric_series(series: pd.Series) -> pd.Series:
+    """
+    clean_numeric 的向量化版本，整欄一次轉換。
+    
+    Args:
+        series: 要清洗的欄位
+    
+    Returns:
+        數值欄位，無效值為 NaN
+    """
+    cleaned = series.astype(str).str.translate(_COMMA_STRIP).str.replace("--", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def _fetch_json(url: str):
+    """
+    以共用 Session 抓取 JSON API。
+    
+    Args:
+        url: API 網址
+    
+    Returns:
+        解析後的 JSON 資料
+    """
+    response = _get_session().get(url, timeout=15)
+    response.raise_for_status()
+    if ORJSON_AVAILABLE:
+        # orjson 直接解析原始 bytes，省去 requests 的文字解碼步驟
+        return orjson.loads(response.content)
+    return response.json()
+
+
+@ttl_cache()
 def get_twse_df() -> pd.DataFrame:
     """
     獲取上市 (TWSE) 股票的週轉率資料。
@@ -248,19 +455,18 @@ def get_twse_df() -> pd.DataFrame:
     Returns:
         DataFrame，包含 code, name, turnover, close, chg_pct, market 欄位
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
-    
     # 標準欄位
     STANDARD_COLUMNS = ['code', 'name', 'close', 'turnover', 'chg_pct', 'market']
     
     try:
-        # 1. 抓取股價與成交量資料
+        # 1. 同時抓取股價與成交量資料、股本資料（兩支 API 互不相依）
         price_url = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
-        price_response = requests.get(price_url, headers=headers, timeout=15)
-        price_response.raise_for_status()
-        price_data = price_response.json()
+        capital_url = "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            price_future = executor.submit(_fetch_json, price_url)
+            capital_future = executor.submit(_fetch_json, capital_url)
+            price_data = price_future.result()
+            capital_data = capital_future.result()
         
         if not price_data:
             raise Exception("無法從 TWSE API 取得股價資料")
@@ -277,15 +483,10 @@ def get_twse_df() -> pd.DataFrame:
         
         # 資料清洗
         price_df["code"] = price_df["code"].astype(str).str.strip().str.zfill(4)
-        price_df["TradeVolume"] = price_df["TradeVolume"].apply(clean_numeric)
-        price_df["ClosingPrice"] = price_df["ClosingPrice"].apply(clean_numeric)
-        
-        # 2. 抓取股本資料
-        capital_url = "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"
-        capital_response = requests.get(capital_url, headers=headers, timeout=15)
-        capital_response.raise_for_status()
-        capital_data = capital_response.json()
+        price_df["TradeVolume"] = clean_numeric_series(price_df["TradeVolume"])
+        price_df["ClosingPrice"] = clean_numeric_series(price_df["ClosingPrice"])
         
+        # 2. 處理股本資料
         if not capital_data:
             raise Exception("無法從 TWSE API 取得股本資料")
         
@@ -299,37 +500,29 @@ def get_twse_df() -> pd.DataFrame:
         
         # 資料清洗
         capital_df["code"] = capital_df["code"].astype(str).str.strip().str.zfill(4)
-        capital_df["IssuedShares"] = capital_df["IssuedShares"].apply(clean_numeric)
-        
-        # 去重（保留第一筆）
-        capital_df = capital_df.drop_duplicates(subset=["code"], keep="first")
-        
-        # 3. 合併資料
-        merged_df = pd.merge(
-            price_df[["code", "name", "TradeVolume", "ClosingPrice"]],
-            capital_df[["code", "IssuedShares"]],
-            on="code",
-            how="inner"
+        capital_df["IssuedShares"] = clean_numeric_series(capital_df["IssuedShares"])
+        
+        # 3. 合併資料：去重（保留第一筆）後以代號查表帶入發行股數，不需整表 merge
+        shares_map = capital_df.drop_duplicates(subset=["code"], keep="first").set_index("code")["IssuedShares"]
+        merged_df = price_df[["code", "name", "TradeVolume", "ClosingPrice"]]
+        merged_df = merged_df[merged_df["code"].isin(shares_map.index)].reset_index(drop=True)
+        merged_df["IssuedShares"] = merged_df["code"].map(shares_map)
+        
+        # 4. 過濾條件（合併成單一遮罩，只篩選一次）
+        # 排除 ETF (00xx)、TDR (91xx)，以及成交量 < 500,000 股（500 張）
+        mask = (
+            ~merged_df["code"].str.startswith(("00", "91"))
+            & (merged_df["TradeVolume"] >= 500000)
         )
-        
-        # 4. 過濾條件
-        # 排除 ETF (00xx)
-        merged_df = merged_df[~merged_df["code"].str.startswith("00")]
-        # 排除 TDR (91xx)
-        merged_df = merged_df[~merged_df["code"].str.startswith("91")]
-        # 排除成交量 < 500,000 股（500 張）
-        merged_df = merged_df[merged_df["TradeVolume"] >= 500000]
+        merged_df = merged_df.loc[mask]
         
         # 5. 計算週轉率
         # 週轉率 (%) = (成交股數 / 發行股數) × 100
         merged_df["turnover"] = (merged_df["TradeVolume"] / merged_df["IssuedShares"]) * 100
         
         # 移除無效的週轉率
-        merged_df = merged_df[
-            (merged_df["turnover"].notna()) &
-            (merged_df["turnover"] != float('inf')) &
-            (merged_df["turnover"] >= 0)
-        ]
+        valid = merged_df["turnover"].notna() & np.isfinite(merged_df["turnover"]) & (merged_df["turnover"] >= 0)
+        merged_df = merged_df.loc[valid]
         
         # 6. 標準化輸出
         result_df = pd.DataFrame({
@@ -344,11 +537,12 @@ def get_twse_df() -> pd.DataFrame:
         return result_df[STANDARD_COLUMNS]
         
     except requests.RequestException as e:
-        raise Exception(f"TWSE API 連線錯誤: {str(e)}")
+        raise Exception(f"TWSE API 連線錯誤: {str(e)}") from e
     except Exception as e:
-        raise Exception(f"處理 TWSE 資料時發生錯誤: {str(e)}")
+        raise Exception(f"處理 TWSE 資料時發生錯誤: {str(e)}") from e
 
 
+@ttl_cache()
 def get_tpex_df() -> pd.DataFrame:
     """
     獲取上櫃 (TPEx) 股票的週轉率資料。
@@ -361,19 +555,13 @@ def get_tpex_df() -> pd.DataFrame:
     Returns:
         DataFrame，包含 code, name, turnover, close, chg_pct, market 欄位
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
-    
     # 標準欄位
     STANDARD_COLUMNS = ['code', 'name', 'close', 'turnover', 'chg_pct', 'market']
     
     try:
         # 抓取資料
         url = "https://www.tpex.org.tw/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php?l=zh-tw&o=json"
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        data = _fetch_json(url)
         
         if not data:
             raise Exception("無法從 TPEx API 取得資料")
@@ -390,76 +578,65 @@ def get_tpex_df() -> pd.DataFrame:
         if not rows:
             raise Exception("TPEx API 回傳的資料為空")
         
-        # 解析資料
-        stocks = []
-        for row in rows:
-            if not row or len(row) < 16:
-                continue
-            
-            # 索引對應：
-            # Index 0: 股票代號
-            # Index 1: 股票名稱
-            # Index 2: 收盤價
-            # Index 8: 成交量（股數）
-            # Index 15: 發行股數（股數）
-            
-            code = str(row[0]).strip()
-            name = str(row[1]).strip()
-            
-            # 只保留 4 碼代號
-            if len(code) != 4 or not code.isdigit():
-                continue
-            
-            # 移除 HTML 標籤（如果有）
-            name = re.sub(r'<[^>]+>', '', name)
-            
-            # 數值清洗
-            close = clean_numeric(row[2])
-            volume = clean_numeric(row[8])
-            issued_shares = clean_numeric(row[15])
-            
-            # 過濾條件：成交量 >= 500,000 股（500 張）
-            if volume is None or volume < 500000:
-                continue
-            
-            # 計算週轉率
-            if issued_shares and issued_shares > 0:
-                turnover = (volume / issued_shares) * 100
-                
-                # 移除無效的週轉率
-                if pd.isna(turnover) or turnover == float('inf') or turnover < 0:
-                    continue
-                
-                stocks.append({
-                    "code": code.zfill(4),
-                    "name": name,
-                    "close": close,
-                    "turnover": turnover,
-                    "chg_pct": None,  # TPEx API 沒有漲跌幅，設為 None
-                    "market": "上櫃"
-                })
+        # 解析資料：先依欄位切成各自的欄陣列，再整欄向量化清洗與過濾
+        # 索引對應：
+        # Index 0: 股票代號
+        # Index 1: 股票名稱
+        # Index 2: 收盤價
+        # Index 8: 成交量（股數）
+        # Index 15: 發行股數（股數）
+        rows = [row for row in rows if row and len(row) >= 16]
+        
+        # 先以字串檢查只保留 4 碼代號，數值清洗只處理留下來的列
+        codes = [str(row[0]).strip() for row in rows]
+        keep = [len(code) == 4 and code.isdigit() for code in codes]
+        rows = [row for row, k in zip(rows, keep) if k]
+        codes = pd.Series([code for code, k in zip(codes, keep) if k], dtype=object)
+        names = pd.Series([str(row[1]).strip() for row in rows], dtype=object)
+        close = clean_numeric_series(pd.Series([row[2] for row in rows], dtype=object))
+        volume = clean_numeric_series(pd.Series([row[8] for row in rows], dtype=object))
+        issued_shares = clean_numeric_series(pd.Series([row[15] for row in rows], dtype=object))
+        
+        # 計算週轉率
+        turnover = volume / issued_shares * 100
+        
+        # 過濾條件：成交量 >= 500,000 股（500 張）、發行股數 > 0、有效的週轉率
+        mask = (
+            (volume >= 500000)
+            & (issued_shares > 0)
+            & np.isfinite(turnover) & (turnover >= 0)
+        )
         
-        if not stocks:
+        if not mask.any():
             raise Exception("無法從 TPEx API 資料中提取有效股票")
         
-        result_df = pd.DataFrame(stocks)
+        # 以明確型別的欄陣列建立結果，省去 pandas 的型別推斷
+        result_df = pd.DataFrame({
+            "code": codes[mask].to_numpy(dtype=object),
+            # 移除 HTML 標籤（如果有）
+            "name": names[mask].str.replace(_HTML_TAG_RE, '', regex=True).to_numpy(dtype=object),
+            "close": close[mask].to_numpy(dtype=np.float64),
+            "turnover": turnover[mask].to_numpy(dtype=np.float64),
+            "chg_pct": None,  # TPEx API 沒有漲跌幅，設為 None
+            "market": "上櫃"
+        })
         return result_df[STANDARD_COLUMNS]
         
     except requests.RequestException as e:
-        raise Exception(f"TPEx API 連線錯誤: {str(e)}")
+        raise Exception(f"TPEx API 連線錯誤: {str(e)}") from e
     except Exception as e:
-        raise Exception(f"處理 TPEx 資料時發生錯誤: {str(e)}")
+        raise Exception(f"處理 TPEx 資料時發生錯誤: {str(e)}") from e
 
 
+@ttl_cache()
 def fetch_turnover_from_api(top_n: Optional[int] = 50) -> pd.DataFrame:
     """
     從 TWSE 和 TPEx API 抓取資料並計算週轉率，合併後返回排名前 N 名。
     
     這是主要的入口函式，會：
-    1. 獲取上市資料
-    2. 獲取上櫃資料
-    3. 合併兩個市場的資料
-    4. 排序並取前 N 名
+    1. 同時獲取上市與上櫃資料
+    2. 合併兩個市場的資料
+    3. 排序並取前 N 名
     
     Args:
         top_n: 要返回的前 N 名（預設 50）
@@ -467,23 +644,22 @@ def fetch_turnover_from_api(top_n: Optional[int] = 50) -> pd.DataFrame:
     Returns:
         DataFrame，包含 code, name, turnover, close, chg_pct, market 欄位
     """
-    twse_df = None
-    tpex_df = None
-    
-    # 獲取上市資料
-    try:
-        twse_df = get_twse_df()
-    except Exception as e:
-        print(f"⚠️ 獲取上市資料失敗: {str(e)}")
+    # 同時獲取上市、上櫃資料（不同主機，互不相依）
+    results = {}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = {
+            executor.submit(get_twse_df): "上市",
+            executor.submit(get_tpex_df): "上櫃",
+        }
+        for future in as_completed(futures):
+            market = futures[future]
+            try:
+                results[market] = future.result()
+            except Exception as e:
+                logger.warning("獲取%s資料失敗: %s", market, e)
     
-    # 延遲 1 秒，避免 API 請求過於頻繁
-    time.sleep(1)
-    
-    # 獲取上櫃資料
-    try:
-        tpex_df = get_tpex_df()
-    except Exception as e:
-        print(f"⚠️ 獲取上櫃資料失敗: {str(e)}")
+    twse_df = results.get("上市")
+    tpex_df = results.get("上櫃")
     
     # 合併資料
     if twse_df is not None and tpex_df is not None:
@@ -495,11 +671,11 @@ def fetch_turnover_from_api(top_n: Optional[int] = 50) -> pd.DataFrame:
     else:
         raise Exception("無法從 TWSE 或 TPEx API 取得任何資料")
     
-    # 排序與篩選
-    combined_df = combined_df.sort_values("turnover", ascending=False).reset_index(drop=True)
-    
-    if top_n:
-        combined_df = combined_df.head(top_n)
+    # 排序與篩選：指定 top_n 時只做部分排序取前 N 名，否則完整排序
+    if top_n is not None and top_n > 0:
+        combined_df = combined_df.nlargest(top_n, "turnover").reset_index(drop=True)
+    else:
+        combined_df = combined_df.sort_values("turnover", ascending=False).reset_index(drop=True)
     
     # 移除 market 欄位（與現有系統格式一致）
     result_df = combined_df[["code", "name", "turnover", "close", "chg_pct"]].copy()
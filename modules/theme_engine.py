@@ -4,11 +4,169 @@
 """
 
 import re
-from typing import Dict, List, Set, Tuple
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
 
+# 「代表公司」字串中括號內的 4 位數股票代碼，例如 "台積電 (2330)"
+STOCK_CODE_RE = re.compile(r"\((\d{4})\)")
+
+# 正規化後的族群清單快取：{id(themes_data): (themes_data, sectors_list, sector_index)}
+# 同時保存原物件參照，確保 id 在快取期間不會被其他物件重用
+_NORMALIZED_THEMES_CACHE: Dict[int, Tuple[object, Optional[List[Dict]], Dict[str, Dict]]] = {}
+_NORMALIZED_THEMES_CACHE_SIZE = 8
+
+# 「股票代碼 → 族群名稱列表」索引快取：{id(themes_data): (themes_data, code_to_themes)}
+_CODE_TO_THEMES_CACHE: Dict[int, Tuple[object, Dict[str, Tuple[str, ...]]]] = {}
+
+# 各族群完整成員清單快取：{id(themes_data): (themes_data, {theme_name: members})}
+_ALL_MEMBERS_CACHE: Dict[int, Tuple[object, Dict[str, List[Dict]]]] = {}
+
+
+def normalize_themes_data(themes_data) -> Optional[List[Dict]]:
+    """
+    將各種族群 JSON 格式統一轉換為 sector 清單（每個元素含 sector_name, description 等）。
+
+    支援四種格式：
+    1. themes_new.json 格式（物件，有 themes 鍵，每個主題有 theme 欄位）
+    2. 新格式（物件，有 popular_sectors 鍵）
+    3. 直接陣列格式（陣列，每個元素是族群物件）
+    4. 舊格式（物件，有 族群清單 鍵）→ 回傳 None，由呼叫端自行處理
+
+    load_supply_chain_json() 對同一檔案回傳同一個物件，因此以物件 id 快取轉換結果，
+    每次請求不必重新轉換整份 themes_new.json。呼叫端不應修改回傳的清單。
+
+    Args:
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+
+    Returns:
+        sector 清單；舊格式則回傳 None
+    """
+    return _get_normalized_entry(themes_data)[0]
+
+
+def _convert_theme_stocks(stocks) -> List[Dict]:
+    """
+    將 themes_new.json 單一主題的 stocks 轉為 sector 格式（intro 轉為 description）。
+
+    Args:
+        stocks: 主題的 stocks 欄位
+
+    Returns:
+        轉換後的股票列表；非陣列時為空列表
+    """
+    if not isinstance(stocks, list):
+        return []
+    return [
+        {
+            "ticker": stock.get("ticker", ""),
+            "name": stock.get("name", ""),
+            "description": stock.get("intro", "")  # intro 轉為 description
+        }
+        for stock in stocks
+        if isinstance(stock, dict)
+    ]
+
+
+def find_sector_by_name(themes_data, theme_name: str) -> Optional[Dict]:
+    """
+    依族群名稱取得 sector 資料（使用快取的「族群名稱 → sector」索引，O(1) 查詢）。
+
+    名稱重複時取清單中第一個出現的族群，與逐一掃描的結果相同。
+
+    Args:
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+        theme_name: 族群名稱
+
+    Returns:
+        sector 字典；找不到或為舊格式時返回 None
+    """
+    return _get_normalized_entry(themes_data)[1].get(theme_name)
+
+
+def _get_normalized_entry(themes_data) -> Tuple[Optional[List[Dict]], Dict[str, Dict]]:
+    """
+    取得（必要時建立）themes_data 的正規化結果與族群名稱索引。
+
+    Returns:
+        (sectors_list, sector_index)；舊格式時 sectors_list 為 None、sector_index 為空字典
+    """
+    cached = _NORMALIZED_THEMES_CACHE.get(id(themes_data))
+    if cached is not None and cached[0] is themes_data:
+        return cached[1], cached[2]
+
+    sectors_list = None
+    if isinstance(themes_data, list):
+        # 直接陣列格式
+        sectors_list = themes_data
+    elif "themes" in themes_data:
+        # themes_new.json 格式（物件，有 themes 鍵，每個主題有 theme 欄位）
+        themes_list = themes_data.get("themes", [])
+        # 轉換格式：將 theme 欄位轉為 sector_name，stocks 的 intro 轉為 description
+        sectors_list = [
+            {
+                "sector_name": theme_info.get("theme", ""),
+                "description": theme_info.get("description", ""),
+                "stocks": _convert_theme_stocks(theme_info.get("stocks", [])),
+            }
+            for theme_info in themes_list
+            if isinstance(theme_info, dict)
+        ]
+    elif "popular_sectors" in themes_data:
+        # 新格式（物件，有 popular_sectors 鍵）
+        sectors_list = themes_data.get("popular_sectors", [])
+
+    # 建立「族群名稱 → sector」索引（名稱重複時保留第一個）
+    sector_index: Dict[str, Dict] = {}
+    for sector_info in sectors_list or []:
+        if isinstance(sector_info, dict):
+            sector_index.setdefault(sector_info.get("sector_name", ""), sector_info)
+
+    if len(_NORMALIZED_THEMES_CACHE) >= _NORMALIZED_THEMES_CACHE_SIZE:
+        # 移除最早加入的項目
+        _NORMALIZED_THEMES_CACHE.pop(next(iter(_NORMALIZED_THEMES_CACHE)))
+    _NORMALIZED_THEMES_CACHE[id(themes_data)] = (themes_data, sectors_list, sector_index)
+
+    return sectors_list, sector_index
+
+
+def _padded_codes(stocks_df: pd.DataFrame) -> List[str]:
+    """
+    取出 DataFrame 的 code 欄並補零為 4 碼字串（與逐列 str(code).zfill(4) 相同）。
+
+    各函式在迴圈前呼叫一次，不在迴圈內逐列重建代碼字串；
+    不在 stocks_df 上新增欄位，以免影響呼叫端與 to_dict() 的輸出。
+
+    Args:
+        stocks_df: 股票 DataFrame，需包含 code 欄位
+
+    Returns:
+        股票代碼列表，順序與 stocks_df 相同
+    """
+    if stocks_df.empty:
+        # 空的 DataFrame 可能連 code 欄位都沒有
+        return []
+    return [str(code).zfill(4) for code in stocks_df["code"].to_numpy()]
+
+
+def _float_column(stocks_df: pd.DataFrame, column: str) -> np.ndarray:
+    """
+    取出數值欄位為 float64 陣列；欄位不存在時回傳全為 NaN 的陣列。
+
+    Args:
+        stocks_df: 股票 DataFrame
+        column: 欄位名稱
+
+    Returns:
+        與 stocks_df 等長的 float64 陣列
+    """
+    if column in stocks_df.columns:
+        return stocks_df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.full(len(stocks_df), np.nan)
+
+
 def extract_stock_code_from_company_name(company_str: str) -> Set[str]:
     """
     從「代表公司」字串中提取股票代碼。
@@ -25,9 +183,7 @@ def extract_stock_code_from_company_name(company_str: str) -> Set[str]:
         股票代碼的集合（可能為空）
     """
     # 匹配括號內的 4 位數字
-    pattern = r"\((\d{4})\)"
-    matches = re.findall(pattern, company_str)
-    return set(matches)
+    return set(STOCK_CODE_RE.findall(company_str))
 
 
 def map_stock_to_themes(
@@ -47,50 +203,65 @@ def map_stock_to_themes(
     Returns:
         字典，key 為股票代碼，value 為該股票所屬的族群名稱列表
     """
+    # 「股票代碼 → 族群名稱列表」索引只與 themes_data 有關，依物件快取
+    code_to_themes = _get_code_to_themes(themes_data)
+
+    # 對每檔股票直接查表找出所屬族群（一次取出整欄代碼，不逐列建立 Series）
     stock_to_themes: Dict[str, List[str]] = {}
+    for stock_code in _padded_codes(stocks_df):
+        stock_to_themes[stock_code] = list(code_to_themes.get(stock_code, ()))
+
+    return stock_to_themes
+
+
+def _get_code_to_themes(themes_data) -> Dict[str, Tuple[str, ...]]:
+    """
+    取得（必要時建立）themes_data 的「股票代碼 → 族群名稱列表」索引。
+
+    與 normalize_themes_data 相同，以物件 id 快取並保存原物件參照；
+    load_supply_chain_json() 在檔案更新後會回傳新物件，快取自然失效。
+
+    Args:
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+
+    Returns:
+        索引字典（值為不可變的 tuple）；呼叫端不應修改
+    """
+    cached = _CODE_TO_THEMES_CACHE.get(id(themes_data))
+    if cached is not None and cached[0] is themes_data:
+        return cached[1]
+
+    # 反轉為「股票代碼 → 族群名稱列表」，順序與 theme_to_stocks 相同
+    building: Dict[str, List[str]] = {}
+    for theme_name, theme_stocks in _build_theme_to_stocks(themes_data).items():
+        for code in theme_stocks:
+            building.setdefault(code, []).append(theme_name)
+    code_to_themes = {code: tuple(theme_names) for code, theme_names in building.items()}
+
+    if len(_CODE_TO_THEMES_CACHE) >= _NORMALIZED_THEMES_CACHE_SIZE:
+        # 移除最早加入的項目
+        _CODE_TO_THEMES_CACHE.pop(next(iter(_CODE_TO_THEMES_CACHE)))
+    _CODE_TO_THEMES_CACHE[id(themes_data)] = (themes_data, code_to_themes)
 
+    return code_to_themes
+
+
+def _build_theme_to_stocks(themes_data) -> Dict[str, FrozenSet[str]]:
+    """
+    走訪族群資料，建立「族群名稱 → 股票代碼集合」對應表。
+
+    Args:
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+
+    Returns:
+        對應表字典；建立完成後唯讀，值轉為 frozenset
+    """
     # 建立「股票代碼 -> 族群名稱」的對應表
     theme_to_stocks: Dict[str, Set[str]] = {}
 
-    # 判斷是新格式還是舊格式
-    # 支援四種格式：
-    # 1. themes_new.json 格式（物件，有 themes 鍵，每個主題有 theme 欄位）
-    # 2. 新格式（物件，有 popular_sectors 鍵）
-    # 3. 直接陣列格式（陣列，每個元素是族群物件）
-    # 4. 舊格式（物件，有 族群清單 鍵）
-    
-    sectors_list = None
-    if isinstance(themes_data, list):
-        # 直接陣列格式
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        # 新格式（物件，有 popular_sectors 鍵）
-        sectors_list = themes_data.get("popular_sectors", [])
-    else:
+    sectors_list = normalize_themes_data(themes_data)
+
+    if sectors_list is None:
         # 舊格式（物件，有 族群清單 鍵）
         for theme_info in themes_data.get("族群清單", []):
             theme_name = theme_info.get("族群名稱", "")
@@ -103,65 +274,50 @@ def map_stock_to_themes(
                     for company_str in companies:
                         codes = extract_stock_code_from_company_name(company_str)
                         theme_to_stocks[theme_name].update(codes)
-        # 舊格式處理完畢，直接返回
-        # 對每檔股票，找出它屬於哪些族群
-        for _, row in stocks_df.iterrows():
-            stock_code = str(row["code"]).zfill(4)
-            matching_themes = []
+    else:
+        # 處理新格式或直接陣列格式
+        for sector_info in sectors_list:
+            sector_name = sector_info.get("sector_name", "")
+            theme_to_stocks[sector_name] = {ticker for ticker, _ in _iter_sector_stocks(sector_info)}
 
-            for theme_name, theme_stocks in theme_to_stocks.items():
-                if stock_code in theme_stocks:
-                    matching_themes.append(theme_name)
+    return {theme_name: frozenset(codes) for theme_name, codes in theme_to_stocks.items()}
 
-            stock_to_themes[stock_code] = matching_themes
 
-        return stock_to_themes
-    
-    # 處理新格式或直接陣列格式
-    if sectors_list is not None:
-        for sector_info in sectors_list:
-            sector_name = sector_info.get("sector_name", "")
-            theme_to_stocks[sector_name] = set()
-
-            # 優先檢查是否有扁平化的 stocks 陣列（頂層）
-            if "stocks" in sector_info:
-                stocks = sector_info.get("stocks", [])
-                if isinstance(stocks, list):
-                    for stock in stocks:
-                        if isinstance(stock, dict):
-                            ticker = stock.get("ticker", "")
-                            # 只處理台股代碼（4位數字），跳過 note 等其他欄位
-                            if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                theme_to_stocks[sector_name].add(ticker)
-            else:
-                # 如果沒有扁平化的 stocks，則從 upstream/midstream/downstream 讀取
-                for stage in ["upstream", "midstream", "downstream"]:
-                    if stage in sector_info:
-                        categories = sector_info[stage]
-                        if isinstance(categories, list):
-                            for category_info in categories:
-                                if isinstance(category_info, dict):
-                                    stocks = category_info.get("stocks", [])
-                                    if isinstance(stocks, list):
-                                        for stock in stocks:
-                                            if isinstance(stock, dict):
-                                                ticker = stock.get("ticker", "")
-                                                # 只處理台股代碼（4位數字），跳過 note 等其他欄位
-                                                if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                                    theme_to_stocks[sector_name].add(ticker)
-
-    # 對每檔股票，找出它屬於哪些族群
-    for _, row in stocks_df.iterrows():
-        stock_code = str(row["code"]).zfill(4)
-        matching_themes = []
-
-        for theme_name, theme_stocks in theme_to_stocks.items():
-            if stock_code in theme_stocks:
-                matching_themes.append(theme_name)
-
-        stock_to_themes[stock_code] = matching_themes
+def _iter_sector_stocks(sector_info: Dict):
+    """
+    逐一產生 sector 中有效的台股股票（ticker 為 4 位數字，跳過 note 等其他欄位）。
 
-    return stock_to_themes
+    優先讀取扁平化的 stocks 陣列（頂層）；沒有時改從 upstream/midstream/downstream 讀取。
+
+    Args:
+        sector_info: 正規化後的 sector 字典
+
+    Yields:
+        (ticker, stock 字典)
+    """
+    if "stocks" in sector_info:
+        stocks = sector_info.get("stocks", [])
+        candidates = [stocks] if isinstance(stocks, list) else []
+    else:
+        candidates = []
+        for stage in ("upstream", "midstream", "downstream"):
+            categories = sector_info.get(stage)
+            if isinstance(categories, list):
+                for category_info in categories:
+                    if isinstance(category_info, dict):
+                        stocks = category_info.get("stocks", [])
+                        if isinstance(stocks, list):
+                            candidates.append(stocks)
+
+    for stocks in candidates:
+        for stock in stocks:
+            # 正常資料每筆都是 dict，直接取值；非 dict（例如註解字串）才走例外略過
+            try:
+                ticker = stock.get("ticker", "")
+            except AttributeError:
+                continue
+            if isinstance(ticker, str) and len(ticker) == 4 and ticker.isdigit():
+                yield ticker, stock
 
 
 def calc_theme_heat(
@@ -183,44 +339,51 @@ def calc_theme_heat(
         DataFrame，欄位：theme_name, count_in_topN, avg_turnover, avg_chg_pct
         按 count_in_topN（降序）、avg_turnover（降序）排序
     """
-    # 統計每個族群
-    theme_stats: Dict[str, Dict] = {}
-    
     # 檢查是否有 turnover 欄位
     has_turnover = "turnover" in stocks_df.columns
 
-    for _, row in stocks_df.iterrows():
-        stock_code = str(row["code"]).zfill(4)
-        themes = stock_to_themes.get(stock_code, [])
-
-        for theme_name in themes:
-            if theme_name not in theme_stats:
-                theme_stats[theme_name] = {
-                    "count": 0,
-                    "turnover_sum": 0.0,
-                    "chg_pct_sum": 0.0,
-                    "chg_pct_count": 0,
-                }
-
-            theme_stats[theme_name]["count"] += 1
-            
-            # 只有在有 turnover 欄位時才累加
-            if has_turnover and pd.notna(row.get("turnover")):
-                theme_stats[theme_name]["turnover_sum"] += row["turnover"]
-
-            if pd.notna(row.get("chg_pct")):
-                theme_stats[theme_name]["chg_pct_sum"] += row["chg_pct"]
-                theme_stats[theme_name]["chg_pct_count"] += 1
+    # 一次取出所需欄位的 float 陣列（缺欄位時以 NaN 填滿）
+    codes = _padded_codes(stocks_df)
+    turnovers = _float_column(stocks_df, "turnover")
+    chg_pcts = _float_column(stocks_df, "chg_pct")
+
+    # 攤平成 (列索引, 族群 id) 兩個平行陣列；族群 id 依第一次出現的順序編號
+    theme_ids: Dict[str, int] = {}
+    member_rows: List[int] = []
+    member_theme_ids: List[int] = []
+    for row_idx, stock_code in enumerate(codes):
+        for theme_name in stock_to_themes.get(stock_code, ()):
+            member_rows.append(row_idx)
+            member_theme_ids.append(theme_ids.setdefault(theme_name, len(theme_ids)))
+
+    # 以 np.bincount 對各族群做分組加總（依輸入順序累加，結果與逐筆相加相同）
+    n_themes = len(theme_ids)
+    rows = np.asarray(member_rows, dtype=np.intp)
+    ids = np.asarray(member_theme_ids, dtype=np.intp)
+
+    member_turnovers = turnovers[rows]
+    turnover_valid = ~np.isnan(member_turnovers)
+    member_chg_pcts = chg_pcts[rows]
+    chg_pct_valid = ~np.isnan(member_chg_pcts)
+
+    counts = np.bincount(ids, minlength=n_themes).tolist()
+    turnover_sums = np.bincount(
+        ids[turnover_valid], weights=member_turnovers[turnover_valid], minlength=n_themes
+    ).tolist()
+    chg_pct_sums = np.bincount(
+        ids[chg_pct_valid], weights=member_chg_pcts[chg_pct_valid], minlength=n_themes
+    ).tolist()
+    chg_pct_counts = np.bincount(ids[chg_pct_valid], minlength=n_themes).tolist()
 
     # 轉換成 DataFrame
     results = []
-    for theme_name, stats in theme_stats.items():
-        count = stats["count"]
-        avg_turnover = stats["turnover_sum"] / count if count > 0 and has_turnover else 0.0
+    for theme_name, theme_id in theme_ids.items():
+        count = counts[theme_id]
+        avg_turnover = turnover_sums[theme_id] / count if count > 0 and has_turnover else 0.0
 
         avg_chg_pct = None
-        if stats["chg_pct_count"] > 0:
-            avg_chg_pct = stats["chg_pct_sum"] / stats["chg_pct_count"]
+        if chg_pct_counts[theme_id] > 0:
+            avg_chg_pct = chg_pct_sums[theme_id] / chg_pct_counts[theme_id]
 
         results.append({
             "theme_name": theme_name,
@@ -243,10 +406,31 @@ def calc_theme_heat(
     return df
 
 
+def invert_stock_to_themes(stock_to_themes: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """
+    將「股票代碼 → 族群列表」反轉為「族群名稱 → 股票代碼集合」。
+
+    逐一族群呼叫 get_stocks_in_theme() 時，先呼叫一次本函式並傳入結果，
+    每個族群就不必再掃描整份 stock_to_themes。
+
+    Args:
+        stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
+
+    Returns:
+        字典，key 為族群名稱，value 為屬於該族群的股票代碼集合
+    """
+    theme_to_codes: Dict[str, Set[str]] = {}
+    for stock_code, themes in stock_to_themes.items():
+        for theme_name in themes:
+            theme_to_codes.setdefault(theme_name, set()).add(stock_code)
+    return theme_to_codes
+
+
 def get_stocks_in_theme(
     stocks_df: pd.DataFrame,
     stock_to_themes: Dict[str, List[str]],
     theme_name: str,
+    theme_to_codes: Optional[Dict[str, Set[str]]] = None,
 ) -> pd.DataFrame:
     """
     取得屬於指定族群的所有股票（從 Top N 中）。
@@ -255,23 +439,23 @@ def get_stocks_in_theme(
         stocks_df: 股票 DataFrame
         stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
         theme_name: 族群名稱
+        theme_to_codes: （可選）invert_stock_to_themes() 預先算好的反向對應表
 
     Returns:
         DataFrame，包含該族群的所有股票
     """
-    matching_stocks = []
-
-    for _, row in stocks_df.iterrows():
-        stock_code = str(row["code"]).zfill(4)
-        themes = stock_to_themes.get(stock_code, [])
-
-        if theme_name in themes:
-            matching_stocks.append(row.to_dict())
+    # 該族群的股票代碼集合：有預先反轉的對應表就直接查表
+    if theme_to_codes is not None:
+        target_codes = theme_to_codes.get(theme_name, set())
+    else:
+        target_codes = {code for code, themes in stock_to_themes.items() if theme_name in themes}
 
-    if not matching_stocks:
+    # 以布林遮罩直接從原 DataFrame 選列，保留原欄位型別，不必逐列轉 dict 再重建
+    mask = np.array([code in target_codes for code in _padded_codes(stocks_df)], dtype=bool)
+    if not mask.any():
         return pd.DataFrame()
 
-    df = pd.DataFrame(matching_stocks)
+    df = stocks_df.loc[mask]
     # 如果有 turnover 欄位，按週轉率排序；否則按代碼排序
     if "turnover" in df.columns:
         df = df.sort_values("turnover", ascending=False).reset_index(drop=True)
@@ -291,37 +475,40 @@ def get_all_members_of_theme(theme_name: str, themes_data: Dict) -> List[Dict]:
     Returns:
         該族群所有股票的列表，每個元素包含 ticker, name, description
     """
-    # 判斷格式
-    sectors_list = None
-    if isinstance(themes_data, list):
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        sectors_list = themes_data.get("popular_sectors", [])
-    else:
+    # 每個族群的成員清單只需走訪一次 JSON，之後直接查表（依 themes_data 物件快取）
+    cached = _ALL_MEMBERS_CACHE.get(id(themes_data))
+    if cached is None or cached[0] is not themes_data:
+        if len(_ALL_MEMBERS_CACHE) >= _NORMALIZED_THEMES_CACHE_SIZE:
+            # 移除最早加入的項目
+            _ALL_MEMBERS_CACHE.pop(next(iter(_ALL_MEMBERS_CACHE)))
+        cached = (themes_data, {})
+        _ALL_MEMBERS_CACHE[id(themes_data)] = cached
+
+    members_by_theme = cached[1]
+    members = members_by_theme.get(theme_name)
+    if members is None:
+        members = _collect_all_members(theme_name, themes_data)
+        # 只快取確實存在的族群，避免任意查詢名稱讓快取無限成長
+        if find_sector_by_name(themes_data, theme_name) is not None:
+            members_by_theme[theme_name] = members
+
+    # 回傳副本，呼叫端修改時不影響快取
+    return [dict(member) for member in members]
+
+
+def _collect_all_members(theme_name: str, themes_data: Dict) -> List[Dict]:
+    """
+    走訪族群資料，收集指定族群的所有有效股票（get_all_members_of_theme 的實際計算）。
+
+    Args:
+        theme_name: 族群名稱
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+
+    Returns:
+        該族群所有股票的列表，每個元素包含 ticker, name, description
+    """
+    sectors_list = normalize_themes_data(themes_data)
+    if sectors_list is None:
         # 舊格式，不支援
         return []
     
@@ -331,46 +518,28 @@ def get_all_members_of_theme(theme_name: str, themes_data: Dict) -> List[Dict]:
             continue
         
         sector_name = sector_info.get("sector_name", "")
-        if sector_name == theme_name:
-            # 優先檢查扁平化的 stocks 陣列（頂層）
-            if "stocks" in sector_info:
-                stocks = sector_info.get("stocks", [])
-                if isinstance(stocks, list):
-                    # 過濾有效的股票（有 ticker）
-                    valid_stocks = []
-                    for stock in stocks:
-                        if isinstance(stock, dict):
-                            ticker = stock.get("ticker", "")
-                            if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                valid_stocks.append({
-                                    "ticker": ticker,
-                                    "name": stock.get("name", ""),
-                                    "description": stock.get("description", "")
-                                })
-                    return valid_stocks
-            else:
-                # 如果沒有扁平化的 stocks，則從 upstream/midstream/downstream 讀取
-                valid_stocks = []
-                for stage in ["upstream", "midstream", "downstream"]:
-                    if stage in sector_info:
-                        categories = sector_info[stage]
-                        if isinstance(categories, list):
-                            for category_info in categories:
-                                if isinstance(category_info, dict):
-                                    stocks = category_info.get("stocks", [])
-                                    if isinstance(stocks, list):
-                                        for stock in stocks:
-                                            if isinstance(stock, dict):
-                                                ticker = stock.get("ticker", "")
-                                                if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                                    # 避免重複（同一檔股票可能出現在多個階段）
-                                                    if not any(s["ticker"] == ticker for s in valid_stocks):
-                                                        valid_stocks.append({
-                                                            "ticker": ticker,
-                                                            "name": stock.get("name", ""),
-                                                            "description": stock.get("description", "")
-                                                        })
-                return valid_stocks
+        if sector_name != theme_name:
+            continue
+
+        # 頂層 stocks 不是陣列時視為無效族群，繼續找下一個同名族群
+        is_flat = "stocks" in sector_info
+        if is_flat and not isinstance(sector_info.get("stocks", []), list):
+            continue
+
+        valid_stocks = []
+        seen_tickers: Set[str] = set()
+        for ticker, stock in _iter_sector_stocks(sector_info):
+            # 上中下游避免重複（同一檔股票可能出現在多個階段）；扁平陣列照原樣保留
+            if not is_flat:
+                if ticker in seen_tickers:
+                    continue
+                seen_tickers.add(ticker)
+            valid_stocks.append({
+                "ticker": ticker,
+                "name": stock.get("name", ""),
+                "description": stock.get("description", "")
+            })
+        return valid_stocks
     
     return []
 
@@ -391,37 +560,35 @@ def get_today_members_of_theme(
     Returns:
         該族群今日出現的股票列表，每個元素包含 ticker, name, turnover, chg_pct, is_focus
     """
-    today_members = []
-    
-    for _, row in today_df.iterrows():
-        stock_code = str(row["code"]).zfill(4)
-        themes = stock_to_themes.get(stock_code, [])
-        
-        if theme_name in themes:
-            member = {
-                "ticker": stock_code,
-                "name": row.get("name", ""),
-            }
-            
-            # 加入週轉率（如果有）
-            if "turnover" in row and pd.notna(row["turnover"]):
-                member["turnover"] = float(row["turnover"])
-            else:
-                member["turnover"] = None
-            
-            # 加入漲跌幅（如果有）
-            if "chg_pct" in row and pd.notna(row["chg_pct"]):
-                member["chg_pct"] = float(row["chg_pct"])
-            else:
-                member["chg_pct"] = None
-            
-            # 加入是否為注意股（如果有）
-            if "is_focus" in row:
-                member["is_focus"] = bool(row["is_focus"])
-            else:
-                member["is_focus"] = False
-            
-            today_members.append(member)
+    # 先以布林遮罩篩出屬於該族群的列，只處理命中的股票
+    codes = _padded_codes(today_df)
+    mask = np.array([theme_name in stock_to_themes.get(code, ()) for code in codes], dtype=bool)
+    members_df = today_df.loc[mask]
+    member_codes = [code for code, hit in zip(codes, mask) if hit]
+    n_members = len(member_codes)
+
+    # 一次取出各欄位；數值欄先轉為 float 陣列，NaN 判斷在迴圈外以陣列完成
+    names = members_df["name"].tolist() if "name" in members_df.columns else [""] * n_members
+    turnovers = _float_column(members_df, "turnover")
+    turnovers = np.where(np.isnan(turnovers), None, turnovers).tolist()
+    chg_pcts = _float_column(members_df, "chg_pct")
+    chg_pcts = np.where(np.isnan(chg_pcts), None, chg_pcts).tolist()
+    if "is_focus" in members_df.columns:
+        focus_flags = [bool(flag) for flag in members_df["is_focus"].tolist()]
+    else:
+        focus_flags = [False] * n_members
+
+    today_members = [
+        {
+            "ticker": stock_code,
+            "name": name,
+            "turnover": turnover,  # 週轉率（無資料為 None）
+            "chg_pct": chg_pct,  # 漲跌幅（無資料為 None）
+            "is_focus": is_focus,  # 是否為注意股
+        }
+        for stock_code, name, turnover, chg_pct, is_focus
+        in zip(member_codes, names, turnovers, chg_pcts, focus_flags)
+    ]
     
     # 按週轉率排序（降序）
     today_members.sort(key=lambda x: x["turnover"] if x["turnover"] is not None else 0, reverse=True)
@@ -1,8 +1,11 @@
 from flask import Blueprint
+import bisect
 import math
 import sys
 import os
 
+import numpy as np
+
 # 添加父目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -14,6 +17,14 @@ FIBONACCI_RETRACEMENT_LEVELS = [0.236, 0.382, 0.500, 0.618]
 # 斐波那契擴展水平（壓力位）
 FIBONACCI_EXTENSION_LEVELS = [1.382, 1.5, 1.618, 1.786, 2.0]
 
+# 向量化計算用的 NumPy 版本（模組載入時建立一次）；擴展水平預先減 1
+_RETRACEMENT_ARRAY = np.array(FIBONACCI_RETRACEMENT_LEVELS, dtype=np.float64)
+_EXTENSION_MINUS_ONE = np.array(FIBONACCI_EXTENSION_LEVELS, dtype=np.float64) - 1
+
+# 台股 Tick Size 級距表：價格 < _TICK_THRESHOLDS[i] 時使用 _TICK_SIZES[i]，其餘使用最後一級
+_TICK_THRESHOLDS = (10, 50, 100, 500, 1000)
+_TICK_SIZES = (0.01, 0.05, 0.10, 0.50, 1.00, 5.00)
+
 
 def get_tick_size(price):
     """
@@ -26,18 +37,7 @@ def get_tick_size(price):
     - 500-1000: 1.00
     - >= 1000: 5.00
     """
-    if price < 10:
-        return 0.01
-    elif price < 50:
-        return 0.05
-    elif price < 100:
-        return 0.10
-    elif price < 500:
-        return 0.50
-    elif price < 1000:
-        return 1.00
-    else:
-        return 5.00
+    return _TICK_SIZES[bisect.bisect_right(_TICK_THRESHOLDS, price)]
 
 
 def adjust_to_tick(price, direction):
@@ -70,6 +70,30 @@ def adjust_to_tick(price, direction):
     return round(adjusted_price, 2)
 
 
+def adjust_levels_to_tick(prices, direction):
+    """
+    adjust_to_tick 的向量化版本：一次修正所有斐波那契水平的價格
+    
+    參數:
+        prices: 原始價格陣列
+        direction: 'resistance' (向下取整) 或 'support' (向上取整)
+    
+    返回:
+        調整後的價格列表（Python float）
+    """
+    prices = np.asarray(prices, dtype=float)
+    tick_sizes = np.take(_TICK_SIZES, np.searchsorted(_TICK_THRESHOLDS, prices, side='right'))
+    
+    if direction == 'resistance':
+        adjusted = np.floor(prices / tick_sizes) * tick_sizes
+    elif direction == 'support':
+        adjusted = np.ceil(prices / tick_sizes) * tick_sizes
+    else:
+        adjusted = prices
+    
+    return np.round(adjusted, 2).tolist()
+
+
 def fibonacci_calculator():
     """斐波那契計算器邏輯（返回數據字典）"""
     from flask import request
@@ -100,7 +124,9 @@ def fibonacci_calculator():
                 
                 # 驗證價格範圍
                 if error is None:
-                    if high_price <= 0 or low_price <= 0:
+                    if not (math.isfinite(high_price) and math.isfinite(low_price)):
+                        error = "請輸入有效的數字"
+                    elif high_price <= 0 or low_price <= 0:
                         error = "價格必須大於 0"
                     elif high_price <= low_price:
                         error = "高點價格必須大於低點價格"
@@ -110,21 +136,21 @@ def fibonacci_calculator():
                         
                         # 計算潛在支撐位（斐波那契回撤）
                         # 公式: Level Price = High Price - (Range * Retracement Percentage)
-                        support_levels = []
-                        for level in FIBONACCI_RETRACEMENT_LEVELS:
-                            support_price = high_price - (range_value * level)
-                            # 應用 Tick Size 修正（支撐位向上取整）
-                            adjusted_price = adjust_to_tick(support_price, direction='support')
-                            support_levels.append((level, adjusted_price))
+                        # 一次計算所有水平，並應用 Tick Size 修正（支撐位向上取整）
+                        support_prices = high_price - range_value * _RETRACEMENT_ARRAY
+                        support_levels = list(zip(
+                            FIBONACCI_RETRACEMENT_LEVELS,
+                            adjust_levels_to_tick(support_prices, direction='support')
+                        ))
                         
                         # 計算潛在壓力位（斐波那契擴展）
                         # 公式: Level Price = High Price + (Range * (Extension - 1))
-                        resistance_levels = []
-                        for level in FIBONACCI_EXTENSION_LEVELS:
-                            resistance_price = high_price + (range_value * (level - 1))
-                            # 應用 Tick Size 修正（壓力位向下取整）
-                            adjusted_price = adjust_to_tick(resistance_price, direction='resistance')
-                            resistance_levels.append((level, adjusted_price))
+                        # 一次計算所有水平，並應用 Tick Size 修正（壓力位向下取整）
+                        resistance_prices = high_price + range_value * _EXTENSION_MINUS_ONE
+                        resistance_levels = list(zip(
+                            FIBONACCI_EXTENSION_LEVELS,
+                            adjust_levels_to_tick(resistance_prices, direction='resistance')
+                        ))
         
         except Exception as e:
             error = f"計算過程中發生錯誤: {str(e)}"
@@ -5,8 +5,10 @@ import requests
 import warnings
 import logging
 from datetime import datetime, timedelta
-import time
 import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
@@ -16,6 +18,9 @@ import os
 # 添加父目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from modules.cache_utils import ttl_cache
+from routes.fibonacci_routes import adjust_levels_to_tick
+
 # 抑制警告訊息
 warnings.filterwarnings('ignore')
 logging.getLogger('yfinance').setLevel(logging.ERROR)
@@ -32,60 +37,103 @@ except ImportError:
     YFINANCE_AVAILABLE = False
     logger.warning("yfinance 未安裝，將僅使用台灣證交所 API")
 
+# 嘗試導入 orjson（解析速度較快），未安裝時退回 response.json()
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
-def get_tick_size(price):
+def _rolling_extreme(values, period, reducer):
     """
-    根據價格獲取台股 Tick Size
-    規則：
-    - < 10: 0.01
-    - 10-50: 0.05
-    - 50-100: 0.10
-    - 100-500: 0.50
-    - 500-1000: 1.00
-    - >= 1000: 5.00
+    計算滾動極值，等同 rolling(window=period, min_periods=1) 的 min/max
+    
+    參數:
+        values: float64 陣列
+        period: 視窗長度
+        reducer: np.fmin 或 np.fmax（忽略 NaN，與 pandas 相同）
+    
+    返回:
+        與 values 等長的陣列
     """
-    if price < 10:
-        return 0.01
-    elif price < 50:
-        return 0.05
-    elif price < 100:
-        return 0.10
-    elif price < 500:
-        return 0.50
-    elif price < 1000:
-        return 1.00
-    else:
-        return 5.00
+    # 與 pandas 相同，inf 視為缺值；前方補 NaN，使前 period-1 根 K 棒以不足期的視窗計算
+    values = np.where(np.isinf(values), np.nan, values)
+    padded = np.concatenate((np.full(period - 1, np.nan), values))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, period)
+    return reducer.reduce(windows, axis=1)
 
 
-def adjust_to_tick(price, direction):
+def _ewm_mean(values, alpha):
     """
-    將價格調整到符合台股 Tick Size 規則的核心修正函數
+    指數加權平均遞迴，等同 Series.ewm(alpha=alpha, adjust=False).mean()
     
     參數:
-        price: 原始價格
-        direction: 'resistance' (壓力/擴展) 或 'support' (支撐/回撤)
+        values: 不含 NaN / inf 的 float64 陣列
+        alpha: 平滑係數
+    
+    返回:
+        與 values 等長的陣列
+    """
+    decay = 1.0 - alpha
+    weight = 1.0 - decay  # 與 pandas 相同的權重寫法，確保逐位元一致
+    result = []
+    state = None
+    for value in values.tolist():
+        if state is None:
+            state = value
+        elif state != value:
+            state = decay * state + weight * value
+        result.append(state)
+    return np.array(result, dtype=np.float64)
+
+
+def _kdj_rsv(high, low, close, period):
+    """
+    計算 KDJ 的 RSV 序列
     
-    規則:
-        - direction='resistance' (壓力/擴展): 向下取整 (floor)，取最接近且小於或等於 price 的 Tick 價格
-        - direction='support' (支撐/回撤): 向上取整 (ceil)，取最接近且大於或等於 price 的 Tick 價格
+    區間高低價相同（無波動）或收盤價缺值時 RSV 以 50 代替，
+    因此結果不含 NaN / inf，後續的 K、D 遞迴不必再補值。
+    
+    參數:
+        high, low, close: 價格序列
+        period: RSV 回看期數
     
     返回:
-        調整後的價格（符合台股 Tick Size 規則）
+        float64 陣列
     """
-    tick_size = get_tick_size(price)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
     
-    if direction == 'resistance':
-        # 壓力/擴展：向下取整 (floor)，取最接近且小於或等於 price 的 Tick 價格
-        adjusted_price = math.floor(price / tick_size) * tick_size
-    elif direction == 'support':
-        # 支撐/回撤：向上取整 (ceil)，取最接近且大於或等於 price 的 Tick 價格
-        adjusted_price = math.ceil(price / tick_size) * tick_size
-    else:
-        # 預設行為：不調整
-        adjusted_price = price
+    lowest_low = _rolling_extreme(low, period, np.fmin)
+    highest_high = _rolling_extreme(high, period, np.fmax)
+    price_range = highest_high - lowest_low
+    has_range = price_range != 0
     
-    return round(adjusted_price, 2)
+    # 預先填入 50，只在區間不為零的位置計算 (close - lowest_low) / range * 100
+    rsv = np.full(len(close), 50.0)
+    np.divide(close - lowest_low, price_range, out=rsv, where=has_range)
+    np.multiply(rsv, 100, out=rsv, where=has_range)
+    rsv[~np.isfinite(rsv)] = 50.0
+    return rsv
+
+
+def _trailing_mean(values, window):
+    """
+    計算最後 window 個值的平均（即 rolling(window).mean() 的最後一個值）
+    
+    參數:
+        values: 數值陣列
+        window: 視窗長度
+    
+    返回:
+        平均值；資料不足 window 個或視窗內含 NaN 時返回 NaN
+    """
+    if len(values) < window:
+        return np.nan
+    # fsum 精確加總，不受滾動累加誤差影響
+    return math.fsum(values[-window:]) / window
 
 
 def calculate_kdj(high, low, close, period=9, k_period=3, d_period=3):
@@ -93,38 +141,83 @@ def calculate_kdj(high, low, close, period=9, k_period=3, d_period=3):
     計算 KDJ 指標
     參數: period=9, k_period=3, d_period=3
     """
-    # 轉換為 pandas Series 以便使用 rolling
-    high_series = pd.Series(high)
-    low_series = pd.Series(low)
-    close_series = pd.Series(close)
+    if len(close) == 0:
+        return np.empty(0), np.empty(0)
     
     # 計算 RSV
-    lowest_low = low_series.rolling(window=period, min_periods=1).min()
-    highest_high = high_series.rolling(window=period, min_periods=1).max()
-    
-    rsv = ((close_series - lowest_low) / (highest_high - lowest_low) * 100).fillna(50)
+    rsv = _kdj_rsv(high, low, close, period)
     
     # 計算 K 值（使用 EMA，平滑係數為 1/3）
-    k = rsv.ewm(alpha=1/3, adjust=False).mean()
-    k = k.fillna(50)
+    k = _ewm_mean(rsv, 1/3)
     
     # 計算 D 值（K 值的 EMA）
-    d = k.ewm(alpha=1/3, adjust=False).mean()
-    d = d.fillna(50)
+    d = _ewm_mean(k, 1/3)
     
-    return k.values, d.values
+    return k, d
 
 
-def get_twse_stock_data(stock_no, days=180):
+def calculate_kd_tail(high, low, close, period=9, samples=2):
     """
-    從台灣證交所 API 獲取股票數據（改進版：支援重試、更長超時、詳細日誌）
+    只計算最後 samples 根 K 棒的 K、D 值（金叉判斷只需要最近兩根）
+    
+    K 與 D 的遞迴在同一個迴圈內推進，只保留狀態與最後幾個值，
+    不建立完整的 K、D 序列。結果與 calculate_kdj() 的最後 samples 個值相同。
     
     參數:
-        stock_no: 股票代碼（4位數字，例如 "2330"）
-        days: 需要獲取的天數
+        high, low, close: 價格序列
+        period: RSV 回看期數
+        samples: 要保留的最後幾根
     
     返回:
-        pandas DataFrame 包含 Open, High, Low, Close, Volume 欄位
+        (k, d)：長度為 min(samples, len(close)) 的陣列
+    """
+    if len(close) == 0:
+        return np.empty(0), np.empty(0)
+    
+    rsv = _kdj_rsv(high, low, close, period)
+    
+    # 與 _ewm_mean 相同的 adjust=False 遞迴（平滑係數為 1/3），D 為 K 的再平滑
+    decay = 1.0 - 1/3
+    weight = 1.0 - decay
+    values = rsv.tolist()
+    k = d = values[0]
+    k_values = []
+    d_values = []
+    start = len(values) - samples
+    for i, value in enumerate(values):
+        if i:
+            if k != value:
+                k = decay * k + weight * value
+            if d != k:
+                d = decay * d + weight * k
+        if i >= start:
+            k_values.append(k)
+            d_values.append(d)
+    
+    return np.array(k_values, dtype=np.float64), np.array(d_values, dtype=np.float64)
+
+
+# 證交所個股日成交資訊 API
+_TWSE_STOCK_DAY_URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY"
+
+# 逐月抓取證交所資料的並行度與速率限制
+# 證交所會對頻繁請求的 IP 限流，整個行程維持每秒最多送出 1 個請求（與原本逐月 sleep(1) 相同）；
+# 多個執行緒仍可讓各自的請求往返時間重疊，不必等前一個月份回應後才送出下一個
+_TWSE_MAX_WORKERS = 6
+_TWSE_REQUEST_INTERVAL = 1.0
+# 證交所日成交資料解析後的欄位（逐欄累積）
+_TWSE_COLUMNS = ('Date', 'Open', 'High', 'Low', 'Close', 'Volume')
+# 下一個證交所請求最早可送出的時間（time.monotonic()）
+_twse_next_request_at = 0.0
+_twse_rate_lock = threading.Lock()
+
+
+def _build_twse_session():
+    """
+    建立共用的證交所 requests.Session（連線池 + 重試策略 + 固定標頭）
+    
+    所有證交所請求（逐月日成交資料、股票名稱查詢）共用同一個 Session，
+    重複利用已建立的 keep-alive TLS 連線，避免每次請求重新握手。
     """
     # 配置重試策略
     try:
@@ -134,10 +227,14 @@ def get_twse_stock_data(stock_no, days=180):
             status_forcelist=[429, 500, 502, 503, 504],  # 需要重試的 HTTP 狀態碼
             allowed_methods=["GET"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(
+            pool_connections=_TWSE_POOL_SIZE,
+            pool_maxsize=_TWSE_POOL_SIZE,
+            max_retries=retry_strategy
+        )
     except Exception:
-        # 如果 urllib3 版本較舊，使用簡單的 session
-        adapter = HTTPAdapter()
+        # 如果 urllib3 版本較舊，使用簡單的 adapter
+        adapter = HTTPAdapter(pool_connections=_TWSE_POOL_SIZE, pool_maxsize=_TWSE_POOL_SIZE)
     
     session = requests.Session()
     session.mount("https://", adapter)
@@ -149,145 +246,314 @@ def get_twse_stock_data(stock_no, days=180):
         'Accept-Language': 'zh-TW,zh;q=0.9,en;q=0.8',
         'Referer': 'https://www.twse.com.tw/',
     })
+    return session
+
+
+# 連線池大小需涵蓋所有並行中的查詢（每個查詢最多 _TWSE_MAX_WORKERS 條連線）
+_TWSE_POOL_SIZE = 16
+_SESSION = _build_twse_session()
+
+
+def _acquire_twse_rate_token():
+    """
+    等待到下一個可送出證交所請求的時間點
     
-    all_data = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
+    以時間戳記分配請求時段：每次呼叫預約目前最早的空檔，並將下一個空檔往後推
+    _TWSE_REQUEST_INTERVAL 秒，不需為每個請求另開計時執行緒。
+    """
+    global _twse_next_request_at
+    with _twse_rate_lock:
+        now = time.monotonic()
+        slot = max(now, _twse_next_request_at)
+        _twse_next_request_at = slot + _TWSE_REQUEST_INTERVAL
+    if slot > now:
+        time.sleep(slot - now)
+
+
+def _fetch_month(session, stock_no, month, start_date, end_date):
+    """
+    獲取單一月份的證交所日成交資料
     
-    # 台灣證交所 API 一次只能獲取一個月的數據，需要逐月獲取
-    # 從起始月份的第一天開始，逐月獲取
-    current_month = start_date.replace(day=1)
-    end_month = end_date.replace(day=1)
+    參數:
+        session: 共用的 requests.Session
+        stock_no: 股票代碼
+        month: 該月第一天（datetime）
+        start_date, end_date: 只保留落在此區間內的交易日
+    
+    返回:
+        (columns, title)：columns 為 {欄位名稱: list}，欄位依 _TWSE_COLUMNS；
+        title 為回應中的標題（含股票名稱），取不到時為 None
+    """
+    # 格式化日期為 YYYYMMDD（取該月第一天）
+    date_str = month.strftime('%Y%m%d')
+    month_label = month.strftime('%Y-%m')
     
-    total_months = (end_month.year - current_month.year) * 12 + (end_month.month - current_month.month) + 1
-    logger.info(f"開始獲取股票 {stock_no} 的數據，共需獲取 {total_months} 個月的數據")
+    max_retries = 3
+    retry_count = 0
+    success = False
+    columns = {name: [] for name in _TWSE_COLUMNS}
+    title = None
     
-    month_count = 0
-    while current_month <= end_month:
-        month_count += 1
-        # 格式化日期為 YYYYMMDD（取該月第一天）
-        date_str = current_month.strftime('%Y%m%d')
-        
-        max_retries = 3
-        retry_count = 0
-        success = False
+    # 連線錯誤、逾時與 429/5xx 由 session 掛載的 Retry 負責重試與退避；
+    # 這裡的迴圈只重試 API 回應內容異常的情況（不再額外 sleep，請求間隔由令牌控制）
+    # 查詢參數在重試間不變，只建立一次（依序為 response, date, stockNo）
+    params = (('response', 'json'), ('date', date_str), ('stockNo', stock_no))
+    
+    while retry_count < max_retries and not success:
+        try:
+            # 避免請求過於頻繁，觸發 API 頻率限制
+            _acquire_twse_rate_token()
+            # 增加超時時間到 30 秒，適應 Render 的網路環境
+            response = session.get(_TWSE_STOCK_DAY_URL, params=params, timeout=30)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            # Retry 已用盡，不再重複重試
+            logger.warning("請求失敗: %s (月份: %s)", e, month_label)
+            break
         
-        while retry_count < max_retries and not success:
-            try:
-                url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-                params = {
-                    'response': 'json',
-                    'date': date_str,
-                    'stockNo': stock_no
-                }
-                
-                # 增加超時時間到 30 秒，適應 Render 的網路環境
-                response = session.get(url, params=params, timeout=30)
-                response.raise_for_status()
-                
+        try:
+            if ORJSON_AVAILABLE:
+                # orjson 直接解析原始 bytes，省去 requests 的文字解碼步驟
+                data = orjson.loads(response.content)
+            else:
                 data = response.json()
-                
-                # 檢查 API 回應
-                if data.get('stat') == 'OK' and 'data' in data:
-                    # 解析數據
-                    row_count = 0
-                    for row in data['data']:
-                        try:
-                            # 日期格式：民國年/MM/DD，需要轉換為西元年
-                            date_str_row = row[0].strip()
-                            date_parts = date_str_row.split('/')
-                            if len(date_parts) == 3:
-                                roc_year = int(date_parts[0])
-                                year = roc_year + 1911  # 轉換為西元年
-                                month = int(date_parts[1])
-                                day = int(date_parts[2])
+            
+            # 檢查 API 回應
+            if data.get('stat') == 'OK' and 'data' in data:
+                title = data.get('title')
+                # 解析數據（逐欄累積，避免每筆建立 dict）
+                columns = {name: [] for name in _TWSE_COLUMNS}
+                dates = columns['Date']
+                opens = columns['Open']
+                highs = columns['High']
+                lows = columns['Low']
+                closes = columns['Close']
+                volumes = columns['Volume']
+                for row in data['data']:
+                    try:
+                        # 日期格式：民國年/MM/DD，需要轉換為西元年
+                        date_str_row = row[0].strip()
+                        date_parts = date_str_row.split('/')
+                        if len(date_parts) == 3:
+                            roc_year = int(date_parts[0])
+                            year = roc_year + 1911  # 轉換為西元年
+                            month_num = int(date_parts[1])
+                            day = int(date_parts[2])
+                            
+                            date = datetime(year, month_num, day)
+                            if start_date <= date <= end_date:
+                                # 台灣證交所 API 數據格式：
+                                # [0]日期, [1]成交股數, [2]成交金額, [3]開盤, [4]最高, [5]最低, [6]收盤, [7]漲跌價差, [8]成交筆數
+                                open_price = float(str(row[3]).replace(',', '').replace('--', '0'))
+                                high_price = float(str(row[4]).replace(',', '').replace('--', '0'))
+                                low_price = float(str(row[5]).replace(',', '').replace('--', '0'))
+                                close_price = float(str(row[6]).replace(',', '').replace('--', '0'))
+                                
+                                # 成交量（成交股數）
+                                volume_str = str(row[1]).replace(',', '').replace('--', '0')
+                                volume = int(float(volume_str)) if volume_str else 0
                                 
-                                date = datetime(year, month, day)
-                                if start_date <= date <= end_date:
-                                    # 台灣證交所 API 數據格式：
-                                    # [0]日期, [1]成交股數, [2]成交金額, [3]開盤, [4]最高, [5]最低, [6]收盤, [7]漲跌價差, [8]成交筆數
-                                    open_price = float(str(row[3]).replace(',', '').replace('--', '0'))
-                                    high_price = float(str(row[4]).replace(',', '').replace('--', '0'))
-                                    low_price = float(str(row[5]).replace(',', '').replace('--', '0'))
-                                    close_price = float(str(row[6]).replace(',', '').replace('--', '0'))
-                                    
-                                    # 成交量（成交股數）
-                                    volume_str = str(row[1]).replace(',', '').replace('--', '0')
-                                    volume = int(float(volume_str)) if volume_str else 0
-                                    
-                                    all_data.append({
-                                        'Date': date,
-                                        'Open': open_price,
-                                        'High': high_price,
-                                        'Low': low_price,
-                                        'Close': close_price,
-                                        'Volume': volume
-                                    })
-                                    row_count += 1
-                        except (ValueError, IndexError, TypeError) as e:
-                            # 跳過無法解析的數據
-                            continue
-                    
-                    if row_count > 0:
-                        logger.info(f"成功獲取 {current_month.strftime('%Y-%m')} 的數據，共 {row_count} 筆")
-                        success = True
-                    else:
-                        logger.warning(f"{current_month.strftime('%Y-%m')} 的數據為空")
-                        success = True  # 即使沒有數據，也算成功（可能是非交易日）
-                elif data.get('stat') != 'OK':
-                    error_msg = data.get('message', 'Unknown error')
-                    logger.warning(f"API 返回錯誤狀態: {error_msg} (月份: {current_month.strftime('%Y-%m')})")
-                    if '很抱歉' in str(error_msg) or '沒有符合條件的資料' in str(error_msg):
-                        # 該月份沒有數據，視為成功
-                        success = True
-                    else:
-                        retry_count += 1
+                                dates.append(date)
+                                opens.append(open_price)
+                                highs.append(high_price)
+                                lows.append(low_price)
+                                closes.append(close_price)
+                                volumes.append(volume)
+                    except (ValueError, IndexError, TypeError) as e:
+                        # 跳過無法解析的數據
+                        continue
+                
+                if dates:
+                    logger.info("成功獲取 %s 的數據，共 %s 筆", month_label, len(dates))
+                else:
+                    logger.warning("%s 的數據為空", month_label)
+                success = True  # 即使沒有數據，也算成功（可能是非交易日）
+            elif data.get('stat') != 'OK':
+                error_msg = data.get('message', 'Unknown error')
+                logger.warning("API 返回錯誤狀態: %s (月份: %s)", error_msg, month_label)
+                if '很抱歉' in str(error_msg) or '沒有符合條件的資料' in str(error_msg):
+                    # 該月份沒有數據，視為成功
+                    success = True
                 else:
-                    logger.warning(f"API 回應格式異常 (月份: {current_month.strftime('%Y-%m')})")
                     retry_count += 1
-                
-            except requests.exceptions.Timeout:
-                retry_count += 1
-                logger.warning(f"請求超時 (月份: {current_month.strftime('%Y-%m')}, 重試 {retry_count}/{max_retries})")
-                if retry_count < max_retries:
-                    time.sleep(2 ** retry_count)  # 指數退避
-            except requests.exceptions.RequestException as e:
-                retry_count += 1
-                logger.warning(f"請求失敗: {str(e)} (月份: {current_month.strftime('%Y-%m')}, 重試 {retry_count}/{max_retries})")
-                if retry_count < max_retries:
-                    time.sleep(2 ** retry_count)  # 指數退避
-            except Exception as e:
-                logger.error(f"處理數據時發生錯誤: {str(e)} (月份: {current_month.strftime('%Y-%m')})")
+            else:
+                logger.warning("API 回應格式異常 (月份: %s)", month_label)
                 retry_count += 1
-                if retry_count < max_retries:
-                    time.sleep(2 ** retry_count)
-        
-        # 避免請求過於頻繁（增加延遲時間）
-        time.sleep(1.0)  # 增加到 1 秒，避免觸發 API 頻率限制
-        
+            
+        except Exception as e:
+            logger.error("處理數據時發生錯誤: %s (月份: %s)", e, month_label)
+            retry_count += 1
+    
+    return columns, title
+
+
+@ttl_cache()
+def _load_twse_stock_data(stock_no, days):
+    """
+    逐月下載並組合證交所日成交資料（以 (stock_no, days) 為鍵快取 5 分鐘）
+    
+    同一次訊號查詢中日線、週線與2年支撐壓力位會重複要求相同區間，
+    快取後每個區間只需下載一次；取得不到任何資料時拋出 ValueError，不會被快取。
+    
+    參數:
+        stock_no: 股票代碼
+        days: 需要獲取的天數
+    
+    返回:
+        pandas DataFrame 包含 Open, High, Low, Close, Volume 欄位
+    """
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    
+    # 台灣證交所 API 一次只能獲取一個月的數據，需要逐月獲取
+    # 從起始月份的第一天開始，列出所有需要的月份
+    current_month = start_date.replace(day=1)
+    end_month = end_date.replace(day=1)
+    months = []
+    while current_month <= end_month:
+        months.append(current_month)
         # 移到下一個月
         if current_month.month == 12:
             current_month = current_month.replace(year=current_month.year + 1, month=1)
         else:
             current_month = current_month.replace(month=current_month.month + 1)
     
-    if not all_data:
-        logger.error(f"無法獲取股票 {stock_no} 的任何數據")
-        return None
+    logger.info("開始獲取股票 %s 的數據，共需獲取 %s 個月的數據", stock_no, len(months))
     
-    # 轉換為 DataFrame
-    df = pd.DataFrame(all_data)
-    df.set_index('Date', inplace=True)
-    df.sort_index(inplace=True)
+    # 各月份請求彼此獨立，並行送出以重疊網路等待時間（速率由令牌限制）
+    all_data = {name: [] for name in _TWSE_COLUMNS}
+    title = None
+    with ThreadPoolExecutor(max_workers=_TWSE_MAX_WORKERS) as executor:
+        for month_columns, month_title in executor.map(
+            lambda month: _fetch_month(_SESSION, stock_no, month, start_date, end_date),
+            months
+        ):
+            for name in _TWSE_COLUMNS:
+                all_data[name].extend(month_columns[name])
+            # 月份依序返回，保留最近一個月的標題（與以當日查詢取得的標題相同）
+            title = month_title or title
     
-    # 確保欄位名稱與 yfinance 格式一致
-    df.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    if not all_data['Date']:
+        raise ValueError(f"無法獲取股票 {stock_no} 的任何數據")
     
-    logger.info(f"成功獲取股票 {stock_no} 的數據，共 {len(df)} 筆")
+    # 直接以欄位陣列建立 DataFrame（欄位名稱與 yfinance 格式一致）
+    df = pd.DataFrame(
+        {
+            'Open': np.asarray(all_data['Open'], dtype=np.float64),
+            'High': np.asarray(all_data['High'], dtype=np.float64),
+            'Low': np.asarray(all_data['Low'], dtype=np.float64),
+            'Close': np.asarray(all_data['Close'], dtype=np.float64),
+            'Volume': np.asarray(all_data['Volume'], dtype=np.int64),
+        },
+        index=pd.DatetimeIndex(all_data['Date'], name='Date')
+    )
+    df.sort_index(inplace=True)
+    # 每個月份的回應都帶有標題，直接保存，不必為股票名稱另外發出請求
+    df.attrs['title'] = title
+    
+    logger.info("成功獲取股票 %s 的數據，共 %s 筆", stock_no, len(df))
     
     return df
 
 
+def get_twse_stock_data(stock_no, days=180):
+    """
+    從台灣證交所 API 獲取股票數據（改進版：支援重試、更長超時、詳細日誌）
+    
+    參數:
+        stock_no: 股票代碼（4位數字，例如 "2330"）
+        days: 需要獲取的天數
+    
+    返回:
+        pandas DataFrame 包含 Open, High, Low, Close, Volume 欄位；無資料時返回 None
+    """
+    try:
+        return _load_twse_stock_data(stock_no, days)
+    except ValueError as e:
+        logger.error(str(e))
+        return None
+
+
+def _twse_stock_name(df):
+    """
+    從 get_twse_stock_data() 返回的 DataFrame 取出股票名稱
+    
+    參數:
+        df: get_twse_stock_data() 的返回值
+    
+    返回:
+        股票名稱，取不到時返回 None
+    """
+    # title 格式通常是 "2330 台積電 個股日成交資訊"
+    title = df.attrs.get('title') or ''
+    parts = title.split()
+    return parts[1] if len(parts) >= 2 else None
+
+
+def _resample_to_weekly(daily_data):
+    """
+    將日線數據轉換為週線數據（開盤取首日、收盤取末日、最高/最低取極值、成交量加總）
+    
+    各欄位直接呼叫 resampler 的 first/max/min/last/sum，
+    比 agg({欄位: 名稱}) 的通用聚合路徑快；沒有交易日的週會被移除。
+    
+    參數:
+        daily_data: 含 Open, High, Low, Close, Volume 欄位的日線 DataFrame
+    
+    返回:
+        週線 DataFrame
+    """
+    resampler = daily_data.resample('W')
+    weekly_data = pd.DataFrame({
+        'Open': resampler['Open'].first(),
+        'High': resampler['High'].max(),
+        'Low': resampler['Low'].min(),
+        'Close': resampler['Close'].last(),
+        'Volume': resampler['Volume'].sum()
+    })
+    return weekly_data.dropna()
+
+
+@ttl_cache()
+def _yf_history(symbol, period):
+    """
+    以 TTL 快取 yfinance 歷史資料，讓訊號計算與2年支撐壓力位共用同一次下載
+    
+    參數:
+        symbol: 含後綴的代碼（例如 "2330.TW"）
+        period: yfinance 期間字串（例如 "6mo"、"2y"）
+    
+    返回:
+        DataFrame（快取內容的副本；查無資料時的空 DataFrame 不會被快取）
+    """
+    return yf.Ticker(symbol).history(period=period)
+
+
+@ttl_cache()
+def _yf_info(symbol):
+    """以 TTL 快取 yfinance 股票資訊（info 需另一次較慢的 API 請求）"""
+    return yf.Ticker(symbol).info
+
+
+# 與歷史資料下載並行查詢 yfinance 股票資訊；未使用的結果仍會留在 _yf_info 快取中
+_YF_INFO_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='yf-info')
+
+
+def _last_months(history, months):
+    """
+    取出歷史資料中最近 months 個月的部分（等同以 period="{months}mo" 下載）
+    
+    參數:
+        history: 以日期為索引的 DataFrame
+        months: 月數
+    
+    返回:
+        DataFrame
+    """
+    cutoff = (pd.Timestamp.now(tz=history.index.tz) - pd.DateOffset(months=months)).normalize()
+    return history[history.index >= cutoff]
+
+
 def try_get_stock_data_yfinance(ticker):
     """
     使用 yfinance 獲取股票數據（第一順位）
@@ -302,46 +568,42 @@ def try_get_stock_data_yfinance(ticker):
         
         for ticker_with_suffix in tickers_to_try:
             try:
-                logger.info(f"嘗試使用 yfinance 獲取 {ticker_with_suffix} 的數據")
-                stock = yf.Ticker(ticker_with_suffix)
+                logger.info("嘗試使用 yfinance 獲取 %s 的數據", ticker_with_suffix)
                 
-                # 獲取日線數據（最近 180 天）
-                daily_data = stock.history(period="6mo")
+                # 股票資訊與歷史資料來自不同的 Yahoo 端點，先送出資訊查詢與下載並行
+                info_future = _YF_INFO_EXECUTOR.submit(_yf_info, ticker_with_suffix)
+                
+                # 獲取週線數據（最近 2 年），日線數據直接取其最近 6 個月，不必另外下載
+                weekly_data_full = _yf_history(ticker_with_suffix, "2y")
                 
-                if daily_data is None or daily_data.empty:
-                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的日線數據")
+                if weekly_data_full is None or weekly_data_full.empty:
+                    logger.warning("yfinance 無法獲取 %s 的日線數據", ticker_with_suffix)
                     continue
                 
-                # 獲取週線數據（最近 2 年）
-                weekly_data_full = stock.history(period="2y")
+                # 獲取日線數據（最近 180 天）
+                daily_data = _last_months(weekly_data_full, 6)
                 
-                if weekly_data_full is None or weekly_data_full.empty:
-                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的週線數據")
+                if daily_data.empty:
+                    logger.warning("yfinance 無法獲取 %s 的日線數據", ticker_with_suffix)
                     continue
                 
                 # 將日線數據轉換為週線數據
-                weekly_data = weekly_data_full.resample('W').agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                }).dropna()
+                weekly_data = _resample_to_weekly(weekly_data_full)
                 
                 # 獲取股票資訊
                 stock_info = {}
                 try:
-                    info = stock.info
+                    info = info_future.result()
                     if info:
                         stock_info['longName'] = info.get('longName', info.get('shortName', ticker))
                 except:
                     stock_info['longName'] = ticker
                 
-                logger.info(f"成功使用 yfinance 獲取 {ticker_with_suffix} 的數據")
+                logger.info("成功使用 yfinance 獲取 %s 的數據", ticker_with_suffix)
                 return daily_data, weekly_data, stock_info, None
                 
             except Exception as e:
-                logger.warning(f"yfinance 獲取 {ticker_with_suffix} 失敗: {str(e)}")
+                logger.warning("yfinance 獲取 %s 失敗: %s", ticker_with_suffix, e)
                 continue
         
         return None, None, None, f"yfinance 無法獲取股票代碼 {ticker} 的數據（已嘗試 .TW 和 .TWO）"
@@ -356,7 +618,7 @@ def try_get_stock_data_twse(stock_no):
     返回: (daily_data, weekly_data, stock_info, error_msg) 或 (None, None, None, error_msg) 如果失敗
     """
     try:
-        logger.info(f"嘗試使用台灣證交所 API 獲取 {stock_no} 的數據")
+        logger.info("嘗試使用台灣證交所 API 獲取 %s 的數據", stock_no)
         
         # 獲取日線數據（最近 180 天）
         daily_data = get_twse_stock_data(stock_no, days=180)
@@ -371,38 +633,15 @@ def try_get_stock_data_twse(stock_no):
             return None, None, None, f"無法從台灣證交所獲取股票代碼 {stock_no} 的週線數據"
         
         # 將日線數據轉換為週線數據（取每週最後一個交易日的數據）
-        weekly_data = weekly_data_full.resample('W').agg({
-            'Open': 'first',
-            'High': 'max',
-            'Low': 'min',
-            'Close': 'last',
-            'Volume': 'sum'
-        }).dropna()
-        
-        # 獲取股票名稱（從證交所 API）
+        weekly_data = _resample_to_weekly(weekly_data_full)
+        
+        # 獲取股票名稱（取自逐月資料回應中的標題）
         stock_info = {}
-        try:
-            # 嘗試獲取股票名稱
-            url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-            params = {
-                'response': 'json',
-                'date': datetime.now().strftime('%Y%m%d'),
-                'stockNo': stock_no
-            }
-            response = requests.get(url, params=params, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('stat') == 'OK' and 'title' in data:
-                    # 從 title 中提取股票名稱
-                    title = data['title']
-                    # title 格式通常是 "2330 台積電 個股日成交資訊"
-                    parts = title.split()
-                    if len(parts) >= 2:
-                        stock_info['longName'] = parts[1]
-        except:
-            pass
-        
-        logger.info(f"成功使用台灣證交所 API 獲取 {stock_no} 的數據")
+        stock_name = _twse_stock_name(daily_data)
+        if stock_name:
+            stock_info['longName'] = stock_name
+        
+        logger.info("成功使用台灣證交所 API 獲取 %s 的數據", stock_no)
         return daily_data, weekly_data, stock_info, None
     
     except Exception as e:
@@ -418,15 +657,15 @@ def get_stock_data(ticker):
     daily_data, weekly_data, stock_info, error_msg = try_get_stock_data_yfinance(ticker)
     
     if daily_data is not None and weekly_data is not None:
-        logger.info(f"使用 yfinance 成功獲取 {ticker} 的數據")
+        logger.info("使用 yfinance 成功獲取 %s 的數據", ticker)
         return daily_data, weekly_data, stock_info, None, "yfinance"
     
     # yfinance 失敗，嘗試台灣證交所 API（第二順位）
-    logger.info(f"yfinance 失敗，嘗試使用台灣證交所 API 獲取 {ticker} 的數據")
+    logger.info("yfinance 失敗，嘗試使用台灣證交所 API 獲取 %s 的數據", ticker)
     daily_data, weekly_data, stock_info, error_msg = try_get_stock_data_twse(ticker)
     
     if daily_data is not None and weekly_data is not None:
-        logger.info(f"使用台灣證交所 API 成功獲取 {ticker} 的數據")
+        logger.info("使用台灣證交所 API 成功獲取 %s 的數據", ticker)
         return daily_data, weekly_data, stock_info, None, "TWSE"
     
     # 兩個數據源都失敗
@@ -441,33 +680,19 @@ def get_stock_data_2years(ticker):
     if not YFINANCE_AVAILABLE:
         # 使用台灣證交所 API 獲取2年數據
         try:
-            logger.info(f"嘗試使用台灣證交所 API 獲取 {ticker} 的2年數據")
+            logger.info("嘗試使用台灣證交所 API 獲取 %s 的2年數據", ticker)
             daily_data_2y = get_twse_stock_data(ticker, days=730)
             
             if daily_data_2y is None or daily_data_2y.empty:
                 return None, None, f"無法從台灣證交所獲取股票代碼 {ticker} 的2年數據", None
             
-            # 獲取股票名稱
+            # 獲取股票名稱（取自逐月資料回應中的標題）
             stock_info = {}
-            try:
-                url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-                params = {
-                    'response': 'json',
-                    'date': datetime.now().strftime('%Y%m%d'),
-                    'stockNo': ticker
-                }
-                response = requests.get(url, params=params, timeout=30)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('stat') == 'OK' and 'title' in data:
-                        title = data['title']
-                        parts = title.split()
-                        if len(parts) >= 2:
-                            stock_info['longName'] = parts[1]
-            except:
-                pass
+            stock_name = _twse_stock_name(daily_data_2y)
+            if stock_name:
+                stock_info['longName'] = stock_name
             
-            logger.info(f"成功使用台灣證交所 API 獲取 {ticker} 的2年數據")
+            logger.info("成功使用台灣證交所 API 獲取 %s 的2年數據", ticker)
             return daily_data_2y, stock_info, None, "TWSE"
         except Exception as e:
             return None, None, f"獲取2年數據時發生錯誤: {str(e)}", None
@@ -478,66 +703,69 @@ def get_stock_data_2years(ticker):
         
         for ticker_with_suffix in tickers_to_try:
             try:
-                logger.info(f"嘗試使用 yfinance 獲取 {ticker_with_suffix} 的2年數據")
-                stock = yf.Ticker(ticker_with_suffix)
+                logger.info("嘗試使用 yfinance 獲取 %s 的2年數據", ticker_with_suffix)
                 
                 # 獲取過去2年的日線數據
-                daily_data_2y = stock.history(period="2y")
+                daily_data_2y = _yf_history(ticker_with_suffix, "2y")
                 
                 if daily_data_2y is None or daily_data_2y.empty:
-                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的2年數據")
+                    logger.warning("yfinance 無法獲取 %s 的2年數據", ticker_with_suffix)
                     continue
                 
                 # 獲取股票資訊
                 stock_info = {}
                 try:
-                    info = stock.info
+                    info = _yf_info(ticker_with_suffix)
                     if info:
                         stock_info['longName'] = info.get('longName', info.get('shortName', ticker))
                 except:
                     stock_info['longName'] = ticker
                 
-                logger.info(f"成功使用 yfinance 獲取 {ticker_with_suffix} 的2年數據")
+                logger.info("成功使用 yfinance 獲取 %s 的2年數據", ticker_with_suffix)
                 return daily_data_2y, stock_info, None, "yfinance"
                 
             except Exception as e:
-                logger.warning(f"yfinance 獲取 {ticker_with_suffix} 的2年數據失敗: {str(e)}")
+                logger.warning("yfinance 獲取 %s 的2年數據失敗: %s", ticker_with_suffix, e)
                 continue
         
         # yfinance 失敗，嘗試台灣證交所 API
-        logger.info(f"yfinance 失敗，嘗試使用台灣證交所 API 獲取 {ticker} 的2年數據")
+        logger.info("yfinance 失敗，嘗試使用台灣證交所 API 獲取 %s 的2年數據", ticker)
         daily_data_2y = get_twse_stock_data(ticker, days=730)
         
         if daily_data_2y is None or daily_data_2y.empty:
             return None, None, f"無法從台灣證交所獲取股票代碼 {ticker} 的2年數據", None
         
-        # 獲取股票名稱
+        # 獲取股票名稱（取自逐月資料回應中的標題）
         stock_info = {}
-        try:
-            url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-            params = {
-                'response': 'json',
-                'date': datetime.now().strftime('%Y%m%d'),
-                'stockNo': ticker
-            }
-            response = requests.get(url, params=params, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('stat') == 'OK' and 'title' in data:
-                    title = data['title']
-                    parts = title.split()
-                    if len(parts) >= 2:
-                        stock_info['longName'] = parts[1]
-        except:
-            pass
-        
-        logger.info(f"成功使用台灣證交所 API 獲取 {ticker} 的2年數據")
+        stock_name = _twse_stock_name(daily_data_2y)
+        if stock_name:
+            stock_info['longName'] = stock_name
+        
+        logger.info("成功使用台灣證交所 API 獲取 %s 的2年數據", ticker)
         return daily_data_2y, stock_info, None, "TWSE"
     
     except Exception as e:
         return None, None, f"獲取2年數據時發生錯誤: {str(e)}", None
 
 
+def _latest_distinct_prices(prices, count):
+    """
+    由近到遠取出前 count 個不重複的價格（四捨五入到小數點後2位比較，保留最近出現的）
+    
+    參數:
+        prices: 依日期由舊到新排列的價格陣列
+        count: 最多取幾個
+    
+    返回:
+        價格陣列（由近到遠）
+    """
+    # 資料已依日期排序，反轉即為由近到遠
+    recent_first = prices[::-1]
+    # np.unique 的 return_index 為每個四捨五入價格第一次出現的位置
+    _, first_index = np.unique(np.round(recent_first, 2), return_index=True)
+    return recent_first[np.sort(first_index)[:count]]
+
+
 def calculate_support_resistance_levels(daily_data_2y, current_price):
     """
     計算多重分形支撐與壓力位（參考 TradingView Fractals 指標）
@@ -557,89 +785,49 @@ def calculate_support_resistance_levels(daily_data_2y, current_price):
                 'error': '數據不足，無法計算支撐壓力位（需要至少11根K棒）'
             }
         
-        # 確保數據按日期排序（由舊到新）
-        daily_data_2y = daily_data_2y.sort_index()
+        # 確保數據按日期排序（由舊到新）；證交所與 yfinance 的資料通常已排序，只在必要時重排
+        if not daily_data_2y.index.is_monotonic_increasing:
+            daily_data_2y = daily_data_2y.sort_index()
         
         # 1. 找出所有分形高點和分形低點（Fractals）
         # 分形高點：高於左右各5根K棒的最高價
         # 分形低點：低於左右各5根K棒的最低價
         window = 5
         
-        fractal_highs = []  # 儲存 (日期, 價格)
-        fractal_lows = []   # 儲存 (日期, 價格)
+        highs = daily_data_2y['High'].to_numpy()
+        lows = daily_data_2y['Low'].to_numpy()
         
-        for i in range(window, len(daily_data_2y) - window):
-            current_high = daily_data_2y['High'].iloc[i]
-            current_low = daily_data_2y['Low'].iloc[i]
-            current_date = daily_data_2y.index[i]
-            
-            # 檢查是否為分形高點（高於左右各5根K棒）
-            is_fractal_high = True
-            for j in range(i - window, i + window + 1):
-                if j != i and daily_data_2y['High'].iloc[j] >= current_high:
-                    is_fractal_high = False
-                    break
-            
-            if is_fractal_high:
-                fractal_highs.append((current_date, current_high))
-            
-            # 檢查是否為分形低點（低於左右各5根K棒）
-            is_fractal_low = True
-            for j in range(i - window, i + window + 1):
-                if j != i and daily_data_2y['Low'].iloc[j] <= current_low:
-                    is_fractal_low = False
-                    break
-            
-            if is_fractal_low:
-                fractal_lows.append((current_date, current_low))
+        # 以滑動視窗一次比較所有 K 棒：每列為中心 K 棒與左右各5根，去掉中心欄即為鄰居
+        span = 2 * window + 1
+        high_windows = np.lib.stride_tricks.sliding_window_view(highs, span)
+        low_windows = np.lib.stride_tricks.sliding_window_view(lows, span)
+        high_neighbors = np.delete(high_windows, window, axis=1)
+        low_neighbors = np.delete(low_windows, window, axis=1)
+        center_highs = highs[window:len(highs) - window]
+        center_lows = lows[window:len(lows) - window]
+        
+        # 分形高點：沒有任何鄰居 >= 中心最高價；分形低點：沒有任何鄰居 <= 中心最低價
+        is_fractal_high = ~(high_neighbors >= center_highs[:, None]).any(axis=1)
+        is_fractal_low = ~(low_neighbors <= center_lows[:, None]).any(axis=1)
+        
+        high_idx = np.flatnonzero(is_fractal_high) + window
+        low_idx = np.flatnonzero(is_fractal_low) + window
         
         # 2. 篩選與排序多重壓力位 (Resistances)
-        # 找出所有 > 當前價格 的分形高點，由近到遠排序（按日期降序），取前3個
-        valid_resistances = [(date, price) for date, price in fractal_highs if price > current_price]
-        
-        # 按日期降序排序（最近的在前）
-        valid_resistances.sort(key=lambda x: x[0], reverse=True)
-        
-        # 過濾重複價格值（保留第一個出現的）
-        seen_prices = set()
-        unique_resistances = []
-        for date, price in valid_resistances:
-            # 將價格四捨五入到小數點後2位進行比較
-            price_rounded = round(price, 2)
-            if price_rounded not in seen_prices:
-                seen_prices.add(price_rounded)
-                unique_resistances.append((date, price))
-                if len(unique_resistances) >= 3:
-                    break
-        
-        # 應用台股 Tick Size 修正（壓力位向下取整）
-        r1 = adjust_to_tick(unique_resistances[0][1], direction='resistance') if len(unique_resistances) >= 1 else None
-        r2 = adjust_to_tick(unique_resistances[1][1], direction='resistance') if len(unique_resistances) >= 2 else None
-        r3 = adjust_to_tick(unique_resistances[2][1], direction='resistance') if len(unique_resistances) >= 3 else None
+        # 找出所有 > 當前價格 的分形高點，由近到遠排序（按日期降序），取前3個不重複價格
+        resistance_prices = highs[high_idx]
+        unique_resistances = _latest_distinct_prices(resistance_prices[resistance_prices > current_price], 3)
+        
+        # 應用台股 Tick Size 修正（壓力位向下取整），一次修正所有壓力位，不足3個以 None 補齊
+        r1, r2, r3 = (adjust_levels_to_tick(unique_resistances, direction='resistance') + [None] * 3)[:3]
         
         # 3. 篩選與排序多重支撐位 (Supports)
-        # 找出所有 < 當前價格 的分形低點，由近到遠排序（按日期降序），取前3個
-        valid_supports = [(date, price) for date, price in fractal_lows if price < current_price]
-        
-        # 按日期降序排序（最近的在前）
-        valid_supports.sort(key=lambda x: x[0], reverse=True)
-        
-        # 過濾重複價格值（保留第一個出現的）
-        seen_prices = set()
-        unique_supports = []
-        for date, price in valid_supports:
-            # 將價格四捨五入到小數點後2位進行比較
-            price_rounded = round(price, 2)
-            if price_rounded not in seen_prices:
-                seen_prices.add(price_rounded)
-                unique_supports.append((date, price))
-                if len(unique_supports) >= 3:
-                    break
-        
-        # 應用台股 Tick Size 修正（支撐位向上取整）
-        s1 = adjust_to_tick(unique_supports[0][1], direction='support') if len(unique_supports) >= 1 else None
-        s2 = adjust_to_tick(unique_supports[1][1], direction='support') if len(unique_supports) >= 2 else None
-        s3 = adjust_to_tick(unique_supports[2][1], direction='support') if len(unique_supports) >= 3 else None
+        # 找出所有 < 當前價格 的分形低點，由近到遠排序（按日期降序），取前3個不重複價格
+        support_prices = lows[low_idx]
+        unique_supports = _latest_distinct_prices(support_prices[support_prices < current_price], 3)
+        
+        # 應用台股 Tick Size 修正（支撐位向上取整），一次修正所有支撐位，不足3個以 None 補齊
+        s1, s2, s3 = (adjust_levels_to_tick(unique_supports, direction='support') + [None] * 3)[:3]
         
         return {
             'r1': round(r1, 2) if r1 is not None else None,
@@ -652,7 +840,7 @@ def calculate_support_resistance_levels(daily_data_2y, current_price):
         }
         
     except Exception as e:
-        logger.error(f"計算多重支撐壓力位時發生錯誤: {str(e)}")
+        logger.error("計算多重支撐壓力位時發生錯誤: %s", e)
         return {
             'r1': None, 'r2': None, 'r3': None,
             's1': None, 's2': None, 's3': None,
@@ -696,7 +884,7 @@ def get_stock_signals(ticker):
         daily_high = daily_data['High'].values
         daily_low = daily_data['Low'].values
         daily_close = daily_data['Close'].values
-        daily_k, daily_d = calculate_kdj(daily_high, daily_low, daily_close)
+        daily_k, daily_d = calculate_kd_tail(daily_high, daily_low, daily_close)
         
         # 判斷日 KD 金叉（K 值上穿 D 值）
         if len(daily_k) >= 2 and len(daily_d) >= 2:
@@ -719,7 +907,7 @@ def get_stock_signals(ticker):
         weekly_high = weekly_data['High'].values
         weekly_low = weekly_data['Low'].values
         weekly_close = weekly_data['Close'].values
-        weekly_k, weekly_d = calculate_kdj(weekly_high, weekly_low, weekly_close)
+        weekly_k, weekly_d = calculate_kd_tail(weekly_high, weekly_low, weekly_close)
         
         # 判斷週 KD 金叉
         if len(weekly_k) >= 2 and len(weekly_d) >= 2:
@@ -738,15 +926,13 @@ def get_stock_signals(ticker):
             signals['weekly_k'] = None
             signals['weekly_d'] = None
         
-        # 計算日線 20 日均線
-        daily_data['MA20'] = daily_data['Close'].rolling(window=20).mean()
-        current_price = daily_data['Close'].iloc[-1]
-        daily_ma20 = daily_data['MA20'].iloc[-1]
+        # 計算日線 20 日均線（只需要最新一天的均線值）
+        current_price = daily_close[-1]
+        daily_ma20 = _trailing_mean(daily_close, 20)
         
         # 計算週線 20 週均線
-        weekly_data['MA20'] = weekly_data['Close'].rolling(window=20).mean()
-        weekly_price = weekly_data['Close'].iloc[-1]
-        weekly_ma20 = weekly_data['MA20'].iloc[-1]
+        weekly_price = weekly_close[-1]
+        weekly_ma20 = _trailing_mean(weekly_close, 20)
         
         # 判斷日線價格是否站上 20MA
         daily_price_above_ma20 = current_price > daily_ma20 if not np.isnan(daily_ma20) else False
@@ -796,7 +982,7 @@ def get_stock_signals(ticker):
                 signals['s3'] = None
                 signals['support_resistance_error'] = f"無法獲取2年歷史數據: {error_msg_2y}" if error_msg_2y else "無法獲取2年歷史數據"
         except Exception as e:
-            logger.error(f"計算多重支撐壓力位時發生錯誤: {str(e)}")
+            logger.error("計算多重支撐壓力位時發生錯誤: %s", e)
             signals['r1'] = None
             signals['r2'] = None
             signals['r3'] = None
@@ -811,6 +997,47 @@ def get_stock_signals(ticker):
         return {"error": f"計算股票訊號時發生錯誤: {str(e)}"}
 
 
+# 進行中的股票訊號查詢：{股票代碼: Future}
+# 同一檔股票的並行查詢共用同一次下游請求，避免重複抓取 yfinance / 證交所資料
+_inflight_signals = {}
+_inflight_lock = threading.Lock()
+
+
+def get_stock_signals_coalesced(ticker):
+    """
+    合併並行的相同股票查詢（single-flight）
+    
+    第一個請求負責實際呼叫 get_stock_signals()，在其完成前到達的相同代碼請求
+    直接等待並共用同一份結果（回傳的 dict 為共用物件，呼叫端不應修改）。
+    
+    參數:
+        ticker: 股票代碼（純數字，例如 "2330"）
+    
+    返回: 與 get_stock_signals() 相同
+    """
+    with _inflight_lock:
+        future = _inflight_signals.get(ticker)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight_signals[ticker] = future
+    
+    if not is_owner:
+        logger.info("合併股票 %s 的並行查詢", ticker)
+        return future.result()
+    
+    try:
+        result = get_stock_signals(ticker)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight_signals.pop(ticker, None)
+
+
 def stock_signals():
     """股票訊號查詢邏輯（返回數據字典）"""
     from flask import request
@@ -829,7 +1056,7 @@ def stock_signals():
                 ticker_clean = ticker.replace('.TW', '').replace('.TWO', '').strip()
                 
                 # 獲取股票訊號（使用台灣證交所 API）
-                signals = get_stock_signals(ticker_clean)
+                signals = get_stock_signals_coalesced(ticker_clean)
                 
                 if 'error' in signals:
                     error = signals['error']
@@ -3,9 +3,13 @@
 提供族群熱度分析、注意股分析等功能
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request
+import json
+import logging
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
@@ -21,36 +25,193 @@ from modules.data_loader import (
 from modules.theme_engine import map_stock_to_themes, calc_theme_heat
 from modules.report_builder import build_theme_report, get_theme_detail_for_display
 
+# 嘗試導入 orjson（解析與序列化速度較快），未安裝時退回 Flask 內建的 JSON 處理
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
 theme_analysis_bp = Blueprint('theme_analysis', __name__)
 
+# /theme-list 回應內容的快取：{id(themes_data): (themes_data, 序列化後的 JSON bytes)}
+# load_supply_chain_json() 已依檔案 mtime 快取解析結果，檔案未修改時回傳同一物件，
+# 因此以物件 id 快取（同時保存原物件參照），檔案更新後自然失效
+_THEME_LIST_CACHE = {}
+
+# 注意股抓取用的背景執行緒池：與週轉率載入、族群計算同時進行（兩者資料互不相依）
+_FOCUS_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+# 週轉率與族群計算完成後，最多再等待注意股結果的秒數；逾時則本次回應不含注意股分析
+_FOCUS_FETCH_TIMEOUT = 10
+
+
+def _json_bytes(payload):
+    """
+    將資料序列化為 UTF-8 編碼的 JSON bytes
+    
+    有 orjson 時直接序列化（numpy 純量可直接序列化，NaN 輸出為 null），
+    未安裝或遇到 orjson 不支援的型別時退回標準庫 json.dumps。
+    
+    參數:
+        payload: 要序列化的資料
+    
+    返回:
+        JSON bytes
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def _json_response(payload):
+    """
+    將回傳資料序列化為 JSON 回應
+    
+    參數:
+        payload: 要回傳的資料
+    
+    返回:
+        Flask Response
+    """
+    return Response(_json_bytes(payload), mimetype='application/json')
+
+
+def _request_json():
+    """
+    解析請求的 JSON 內容（有 orjson 時直接解析原始 bytes）
+    
+    返回:
+        JSON 物件（dict）；Content-Type 不是 JSON、內容格式錯誤或不是物件時返回 None
+    """
+    if not request.is_json:
+        return None
+    if ORJSON_AVAILABLE:
+        try:
+            data = orjson.loads(request.get_data())
+        except orjson.JSONDecodeError:
+            # orjson 不接受 NaN / Infinity 等非標準寫法，交給標準庫再解析一次
+            data = request.get_json(silent=True)
+    else:
+        data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
+def _optional_floats(stocks_df, column):
+    """
+    將數值欄位轉為 Python float 列表，缺值（或欄位不存在）為 None
+    
+    參數:
+        stocks_df: 股票 DataFrame
+        column: 欄位名稱
+    
+    返回:
+        與 stocks_df 等長的列表
+    """
+    if column not in stocks_df.columns:
+        return [None] * len(stocks_df)
+    values = pd.to_numeric(stocks_df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def _stock_records(stocks_df):
+    """
+    將股票 DataFrame 整欄轉換為回傳用的記錄列表（取代逐列 iterrows）
+    
+    參數:
+        stocks_df: 股票 DataFrame，需包含 code 欄位
+    
+    返回:
+        列表，每個元素包含 code（補零為 4 碼）, name, turnover, chg_pct
+    """
+    if stocks_df.empty:
+        return []
+    codes = stocks_df['code'].astype(str).str.zfill(4).tolist()
+    names = stocks_df['name'].tolist() if 'name' in stocks_df.columns else [''] * len(codes)
+    turnovers = _optional_floats(stocks_df, 'turnover')
+    chg_pcts = _optional_floats(stocks_df, 'chg_pct')
+    return [
+        {'code': code, 'name': name, 'turnover': turnover, 'chg_pct': chg_pct}
+        for code, name, turnover, chg_pct in zip(codes, names, turnovers, chg_pcts)
+    ]
+
+
+def _normalize_focus_codes(codes):
+    """
+    將注意股代碼標準化為族群映射用的 4 碼代碼（以 str 向量運算，不逐列呼叫 lambda）
+    
+    4 碼以內的代碼補零為 4 碼；超過 4 碼（權證等）不在族群定義中，以空字串表示。
+    
+    參數:
+        codes: 已去除空白的代碼字串 Series
+    
+    返回:
+        與 codes 等長的 Series
+    """
+    return codes.str.zfill(4).where(codes.str.len() <= 4, '')
+
+
+def _group_records_by_theme(records, stock_to_themes, by_turnover=True):
+    """
+    一次走訪記錄列表，依族群分組（取代逐一族群呼叫 get_stocks_in_theme()）
+    
+    每個族群內的排序與 get_stocks_in_theme() 相同：by_turnover 時按週轉率降序
+    （無資料者排最後），否則按代碼升序。排序為穩定排序，同值者維持原本的名次順序。
+    
+    參數:
+        records: 記錄列表，每個元素至少包含 code（已補零為 4 碼），by_turnover 時另需 turnover
+        stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
+        by_turnover: 是否按週轉率排序
+    
+    返回:
+        字典，key 為族群名稱，value 為該族群的記錄列表（與 records 共用同一批字典）
+    """
+    records_by_theme = {}
+    for record in records:
+        for theme_name in stock_to_themes.get(record['code'], ()):
+            records_by_theme.setdefault(theme_name, []).append(record)
+    
+    if by_turnover:
+        sort_key = lambda record: (record['turnover'] is not None, record['turnover'] or 0.0)
+    else:
+        sort_key = lambda record: record['code']
+    for members in records_by_theme.values():
+        members.sort(key=sort_key, reverse=by_turnover)
+    return records_by_theme
+
 
 @theme_analysis_bp.route('/analyze', methods=['POST'])
 def analyze():
     """分析族群熱度"""
     try:
-        data = request.get_json()
+        data = _request_json()
+        if data is None:
+            return _json_response({'error': '請求內容必須是 JSON 物件'}), 400
         top_n = data.get('top_n', None)
         
         if top_n:
             try:
                 top_n = int(top_n)
                 if top_n < 1:
-                    return jsonify({'error': 'top_n 必須大於 0'}), 400
+                    return _json_response({'error': 'top_n 必須大於 0'}), 400
             except ValueError:
-                return jsonify({'error': 'top_n 必須是有效的數字'}), 400
+                return _json_response({'error': 'top_n 必須是有效的數字'}), 400
+        
+        # 先在背景開始抓取注意股，與下方週轉率載入及族群計算重疊進行
+        focus_future = _FOCUS_EXECUTOR.submit(load_attention_stocks_from_web)
         
-        # 載入週轉率資料
+        # 載入週轉率資料（API 來源已依週轉率取前 top_n 名，並回傳快取的副本，不需再 head().copy()）
         stocks_df = load_today_topN(top_n=top_n, source="api")
         if stocks_df.empty:
-            return jsonify({'error': '無法載入週轉率資料'}), 500
+            return _json_response({'error': '無法載入週轉率資料'}), 500
         
         # 載入族群定義
         themes_data = load_supply_chain_json()
         
-        # 如果指定了 top_n，限制資料
-        if top_n and top_n > 0:
-            stocks_df = stocks_df.head(top_n).copy()
-        
         # 計算族群對應與熱度
         stock_to_themes = map_stock_to_themes(stocks_df, themes_data)
         theme_heat_df = calc_theme_heat(stocks_df, stock_to_themes)
@@ -64,22 +225,22 @@ def analyze():
         focus_df = pd.DataFrame()
         focus_report_data = None
         focus_stock_to_themes = {}
+        focus_for_theme = None
         
         try:
-            focus_df = load_attention_stocks_from_web()
+            focus_df = focus_future.result(timeout=_FOCUS_FETCH_TIMEOUT)
             if not focus_df.empty:
                 # 標準化代碼格式
                 focus_df['code'] = focus_df['code'].astype(str).str.strip()
                 
-                # 為注意股建立標準化代碼欄位（用於族群映射）
+                # 為注意股建立標準化代碼（用於族群映射）
                 # 只對 4 位代碼的注意股進行族群映射（6 位代碼是權證，不在族群定義中）
-                focus_df['code_normalized'] = focus_df['code'].apply(
-                    lambda x: x.zfill(4) if len(x) <= 4 else ''
-                )
+                code_normalized = _normalize_focus_codes(focus_df['code'])
+                is_normal_stock = code_normalized != ''
                 
                 # 建立一個用於族群分析的 DataFrame（只包含一般股票，排除權證）
-                focus_for_theme = focus_df[focus_df['code_normalized'] != ''].copy()
-                focus_for_theme['code'] = focus_for_theme['code_normalized']
+                # 後續查詢個股清單時沿用同一份，不再重建；assign 回傳新物件，不影響 focus_df
+                focus_for_theme = focus_df[is_normal_stock].assign(code=code_normalized[is_normal_stock])
                 
                 if not focus_for_theme.empty:
                     # 獨立對所有注意股進行族群映射（不需要週轉率資料）
@@ -88,46 +249,35 @@ def analyze():
                     focus_report_data = build_theme_report(
                         focus_for_theme, focus_theme_heat_df, focus_stock_to_themes, themes_data
                     )
-                
-                # 移除臨時欄位
-                if 'code_normalized' in focus_df.columns:
-                    focus_df = focus_df.drop(columns=['code_normalized'])
+        except FuturesTimeoutError:
+            # 注意股抓取逾時與載入失敗相同，不影響主流程（背景抓取完成後結果直接捨棄）
+            focus_future.cancel()
+            logger.warning("注意股載入逾時（超過 %s 秒），本次不含注意股分析", _FOCUS_FETCH_TIMEOUT)
         except Exception as e:
-            # 注意股載入失敗不影響主流程，但記錄錯誤以便調試
-            import traceback
-            print(f"注意股載入失敗: {str(e)}")
-            print(traceback.format_exc())
+            # 注意股載入失敗不影響主流程，但記錄錯誤（含 traceback）以便調試
+            logger.exception("注意股載入失敗: %s", e)
         
         # 計算平均週轉率
         avg_turnover = float(stocks_df['turnover'].mean()) if not stocks_df.empty else 0.0
         
-        # 準備週轉率前N名清單
-        turnover_stocks_list = []
-        for _, row in stocks_df.iterrows():
-            stock_code = str(row["code"]).zfill(4)
-            turnover_stocks_list.append({
-                'code': stock_code,
-                'name': row.get('name', ''),
-                'turnover': float(row.get('turnover', 0)) if pd.notna(row.get('turnover')) else None,
-                'chg_pct': float(row.get('chg_pct', 0)) if pd.notna(row.get('chg_pct')) else None,
-            })
+        # 準備週轉率前N名清單（整欄轉換一次，不逐列 iterrows）
+        turnover_stocks_list = _stock_records(stocks_df)
+        
+        # 族群熱度排行只轉換一次 records，族群名稱直接從 records 取得
+        turnover_theme_ranking = turnover_report_data['theme_heat_ranking'].to_dict('records')
         
         # 為每個族群準備個股清單
         theme_stocks_map = {}
-        for theme_name in turnover_report_data['theme_heat_ranking']['theme_name'].tolist():
+        # 一次將 Top N 記錄依族群分組，各族群直接查表
+        stocks_by_theme = _group_records_by_theme(
+            turnover_stocks_list, stock_to_themes, by_turnover='turnover' in stocks_df.columns
+        )
+        for ranking_record in turnover_theme_ranking:
+            theme_name = ranking_record['theme_name']
             # 取得該族群在 Top N 中實際出現的股票
-            from modules.theme_engine import get_stocks_in_theme
-            theme_stocks = get_stocks_in_theme(stocks_df, stock_to_themes, theme_name)
-            if not theme_stocks.empty:
-                theme_stocks_map[theme_name] = []
-                for _, stock_row in theme_stocks.iterrows():
-                    stock_code = str(stock_row["code"]).zfill(4)
-                    theme_stocks_map[theme_name].append({
-                        'code': stock_code,
-                        'name': stock_row.get('name', ''),
-                        'turnover': float(stock_row.get('turnover', 0)) if pd.notna(stock_row.get('turnover')) else None,
-                        'chg_pct': float(stock_row.get('chg_pct', 0)) if pd.notna(stock_row.get('chg_pct')) else None,
-                    })
+            theme_stocks = stocks_by_theme.get(theme_name)
+            if theme_stocks:
+                theme_stocks_map[theme_name] = theme_stocks
         
         # 準備返回資料
         result = {
@@ -137,46 +287,36 @@ def analyze():
                     'total_themes': turnover_report_data['summary']['total_themes'],
                     'avg_turnover': avg_turnover
                 },
-                'theme_heat_ranking': turnover_report_data['theme_heat_ranking'].to_dict('records'),
+                'theme_heat_ranking': turnover_theme_ranking,
                 'theme_stocks': theme_stocks_map,  # 每個族群的個股清單
                 'turnover_stocks_list': turnover_stocks_list,  # 週轉率前N名清單
-                'unclassified_stocks': []
+                # 未分類股票：不屬於任何族群者（直接沿用前N名清單的記錄）
+                'unclassified_stocks': [
+                    record for record in turnover_stocks_list
+                    if not stock_to_themes.get(record['code'])
+                ]
             }
         }
         
-        # 找出未分類股票
-        for _, row in stocks_df.iterrows():
-            stock_code = str(row["code"]).zfill(4)
-            themes = stock_to_themes.get(stock_code, [])
-            if not themes:
-                result['turnover_report']['unclassified_stocks'].append({
-                    'code': stock_code,
-                    'name': row.get('name', ''),
-                    'turnover': float(row.get('turnover', 0)) if pd.notna(row.get('turnover')) else None,
-                    'chg_pct': float(row.get('chg_pct', 0)) if pd.notna(row.get('chg_pct')) else None,
-                })
-        
         # 如果有注意股資料，獨立分析族群熱度
         if not focus_df.empty:
-            # 準備注意股清單（直接使用爬取的資料）
-            focus_stocks_list = []
-            
-            # 遍歷 focus_df，使用爬取的資料
-            for _, row in focus_df.iterrows():
-                # 保持原始代碼格式，不強制補零（因為代碼不一定是4碼）
-                stock_code = str(row["code"]).strip()
-                stock_name = row.get('name', '')
-                # 直接使用爬取的事項描述
-                detail = row.get('detail', '') if 'detail' in row.index else ''
-                
-                focus_stocks_list.append({
+            # 準備注意股清單（直接使用爬取的資料，整欄取出後組成記錄，不逐列 iterrows）
+            # 保持原始代碼格式，不強制補零（因為代碼不一定是4碼）
+            focus_codes = focus_df['code'].astype(str).str.strip().tolist()
+            focus_stock_names = focus_df['name'].tolist() if 'name' in focus_df.columns else [''] * len(focus_codes)
+            # 直接使用爬取的事項描述
+            focus_details = focus_df['detail'].tolist() if 'detail' in focus_df.columns else [''] * len(focus_codes)
+            focus_stocks_list = [
+                {
                     'code': stock_code,  # 使用原始代碼格式
                     'name': stock_name,
                     'detail': detail,  # 事項描述（從爬取的資料中取得）
-                })
+                }
+                for stock_code, stock_name, detail in zip(focus_codes, focus_stock_names, focus_details)
+            ]
             
             # 計算一般股票（非權證）的注意股數量
-            normal_stock_count = len([s for s in focus_stocks_list if len(s['code']) <= 4])
+            normal_stock_count = sum(len(stock_code) <= 4 for stock_code in focus_codes)
             
             # 為每個注意股族群準備個股清單
             focus_theme_stocks_map = {}
@@ -186,41 +326,32 @@ def analyze():
             if focus_report_data:
                 theme_heat_ranking = focus_report_data['theme_heat_ranking'].to_dict('records')
                 
-                # 建立一個用於查詢的 DataFrame
-                focus_for_theme = focus_df.copy()
-                focus_for_theme['code_normalized'] = focus_for_theme['code'].apply(
-                    lambda x: x.zfill(4) if len(x) <= 4 else ''
-                )
-                focus_for_theme = focus_for_theme[focus_for_theme['code_normalized'] != '']
-                focus_for_theme['code'] = focus_for_theme['code_normalized']
+                # focus_for_theme 的代碼已標準化為 4 碼，直接沿用，不再逐欄重新補零
+                # 代碼重複時以第一筆的名稱為準（只建一次，不在迴圈內逐檔篩選 DataFrame）；
+                # 超過 4 碼的權證補零後也不可能與 4 碼代碼相同，因此只需查 focus_for_theme
+                focus_codes_normalized = focus_for_theme['code'].tolist()
+                focus_names = {}
+                for code, name in zip(focus_codes_normalized, focus_for_theme['name'].tolist()):
+                    focus_names.setdefault(code, name)
                 
-                for theme_name in focus_report_data['theme_heat_ranking']['theme_name'].tolist():
-                    from modules.theme_engine import get_stocks_in_theme
-                    theme_stocks = get_stocks_in_theme(focus_for_theme, focus_stock_to_themes, theme_name)
-                    if not theme_stocks.empty:
-                        focus_theme_stocks_map[theme_name] = []
-                        for _, stock_row in theme_stocks.iterrows():
-                            stock_code = str(stock_row["code"]).zfill(4)
-                            # 從原始 focus_df 中查找名稱
-                            orig_row = focus_df[focus_df['code'].str.zfill(4) == stock_code]
-                            stock_name = orig_row.iloc[0].get('name', '') if not orig_row.empty else stock_row.get('name', '')
-                            focus_theme_stocks_map[theme_name].append({
-                                'code': stock_code,
-                                'name': stock_name,
-                            })
+                focus_records = [
+                    {'code': code, 'name': focus_names[code]}
+                    for code in focus_codes_normalized
+                ]
+                focus_stocks_by_theme = _group_records_by_theme(
+                    focus_records, focus_stock_to_themes, by_turnover=False
+                )
+                for ranking_record in theme_heat_ranking:
+                    theme_name = ranking_record['theme_name']
+                    theme_stocks = focus_stocks_by_theme.get(theme_name)
+                    if theme_stocks:
+                        focus_theme_stocks_map[theme_name] = theme_stocks
                 
                 # 找出未分類注意股（一般股票中不屬於任何族群的）
-                for _, row in focus_for_theme.iterrows():
-                    stock_code = str(row["code"]).zfill(4)
-                    themes = focus_stock_to_themes.get(stock_code, [])
-                    if not themes:
-                        # 從原始 focus_df 中查找名稱
-                        orig_row = focus_df[focus_df['code'].str.zfill(4) == stock_code]
-                        stock_name = orig_row.iloc[0].get('name', '') if not orig_row.empty else row.get('name', '')
-                        unclassified_stocks.append({
-                            'code': stock_code,
-                            'name': stock_name,
-                        })
+                unclassified_stocks = [
+                    record for record in focus_records
+                    if not focus_stock_to_themes.get(record['code'])
+                ]
             
             result['focus_report'] = {
                 'summary': {
@@ -234,22 +365,24 @@ def analyze():
                 'unclassified_stocks': unclassified_stocks  # 未分類注意股
             }
         
-        return jsonify(result)
+        return _json_response(result)
         
     except Exception as e:
-        return jsonify({'error': f'分析失敗: {str(e)}'}), 500
+        return _json_response({'error': f'分析失敗: {str(e)}'}), 500
 
 
 @theme_analysis_bp.route('/theme-detail', methods=['POST'])
 def theme_detail():
     """取得族群詳細資訊"""
     try:
-        data = request.get_json()
+        data = _request_json()
+        if data is None:
+            return _json_response({'error': '請求內容必須是 JSON 物件'}), 400
         theme_name = data.get('theme_name')
         stocks_df = data.get('stocks_df')  # 應該是 JSON 格式的 DataFrame
         
         if not theme_name:
-            return jsonify({'error': '請提供 theme_name'}), 400
+            return _json_response({'error': '請提供 theme_name'}), 400
         
         # 載入族群定義
         themes_data = load_supply_chain_json()
@@ -268,12 +401,59 @@ def theme_detail():
         )
         
         if not theme_detail_data:
-            return jsonify({'error': f'找不到族群: {theme_name}'}), 404
+            return _json_response({'error': f'找不到族群: {theme_name}'}), 404
         
-        return jsonify(theme_detail_data)
+        return _json_response(theme_detail_data)
         
     except Exception as e:
-        return jsonify({'error': f'取得族群詳細資訊失敗: {str(e)}'}), 500
+        return _json_response({'error': f'取得族群詳細資訊失敗: {str(e)}'}), 500
+
+
+def _theme_list_body(themes_data):
+    """
+    取得 /theme-list 的回應內容（同一份 themes_data 只建立並序列化一次）
+    
+    參數:
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+    
+    返回:
+        {'themes': 族群清單} 序列化後的 JSON bytes，清單每個元素包含 theme_name, description, stock_count
+    """
+    cached = _THEME_LIST_CACHE.get(id(themes_data))
+    if cached is not None and cached[0] is themes_data:
+        return cached[1]
+    
+    # 判斷格式
+    themes_list = []
+    if isinstance(themes_data, list):
+        themes_list = themes_data
+    elif "themes" in themes_data:
+        themes_list = themes_data.get("themes", [])
+    elif "popular_sectors" in themes_data:
+        themes_list = themes_data.get("popular_sectors", [])
+    else:
+        themes_list = themes_data.get("族群清單", [])
+    
+    # 格式化返回資料
+    result = []
+    for theme_info in themes_list:
+        if isinstance(theme_info, dict):
+            theme_name = theme_info.get("theme") or theme_info.get("sector_name") or theme_info.get("族群名稱", "")
+            description = theme_info.get("description", "")
+            stocks = theme_info.get("stocks", [])
+            
+            result.append({
+                'theme_name': theme_name,
+                'description': description,
+                'stock_count': len(stocks) if isinstance(stocks, list) else 0
+            })
+    
+    body = _json_bytes({'themes': result})
+    
+    # 只保留目前這份族群資料的結果
+    _THEME_LIST_CACHE.clear()
+    _THEME_LIST_CACHE[id(themes_data)] = (themes_data, body)
+    return body
 
 
 @theme_analysis_bp.route('/theme-list', methods=['GET'])
@@ -281,34 +461,8 @@ def theme_list():
     """取得所有族群清單"""
     try:
         themes_data = load_supply_chain_json()
-        
-        # 判斷格式
-        themes_list = []
-        if isinstance(themes_data, list):
-            themes_list = themes_data
-        elif "themes" in themes_data:
-            themes_list = themes_data.get("themes", [])
-        elif "popular_sectors" in themes_data:
-            themes_list = themes_data.get("popular_sectors", [])
-        else:
-            themes_list = themes_data.get("族群清單", [])
-        
-        # 格式化返回資料
-        result = []
-        for theme_info in themes_list:
-            if isinstance(theme_info, dict):
-                theme_name = theme_info.get("theme") or theme_info.get("sector_name") or theme_info.get("族群名稱", "")
-                description = theme_info.get("description", "")
-                stocks = theme_info.get("stocks", [])
-                
-                result.append({
-                    'theme_name': theme_name,
-                    'description': description,
-                    'stock_count': len(stocks) if isinstance(stocks, list) else 0
-                })
-        
-        return jsonify({'themes': result})
+        # 族群定義檔未修改時直接回傳已序列化的內容
+        return Response(_theme_list_body(themes_data), mimetype='application/json')
         
     except Exception as e:
-        return jsonify({'error': f'取得族群清單失敗: {str(e)}'}), 500
-
+        return _json_response({'error': f'取得族群清單失敗: {str(e)}'}), 500